@@ -15,4 +15,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import the FastAPI app - Vercel auto-detects this
-from app.main import app
+from app.main import app, initialize
+
+# Run the startup work during container init as well, in case the runtime skips
+# lifespan events (it only happens once per process either way)
+initialize()
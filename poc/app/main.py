@@ -1,6 +1,8 @@
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,12 +13,35 @@ env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 from .routers import calls_router, dashboard_router
+from .models.database import init_db
+from .services.sentiment_analysis import sentiment_service
+from .services.transcription import transcription_service
+
+
+def initialize():
+    """
+    Bring the schema up to date, load the tiktoken encodings and warm up the local
+    Whisper model if enabled.
+    Shared by the lifespan handler and the Vercel entrypoint; safe to call more than once.
+    """
+    init_db()
+    sentiment_service.warmup()
+    transcription_service.warmup()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    initialize()
+    yield
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Call Quality Auditor",
     description="AI-powered call quality auditing and customer sentiment analysis system",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -0,0 +1,22 @@
+"""
+Deploy-time schema migration. Run it from the poc directory whenever a release changes
+the schema, before the new version takes traffic:
+
+    python -m app.migrate
+
+Instances apply the cheap, idempotent part (tables, columns, daily_agg backfill) on
+startup. Converting key_issues to jsonb and building indexes on existing tables only
+happen here.
+"""
+from pathlib import Path
+from dotenv import load_dotenv
+
+# DATABASE_URL is read when the database module is imported
+load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
+
+from .models.database import migrate_db
+
+
+if __name__ == "__main__":
+    migrate_db()
+    print("Database schema is up to date")
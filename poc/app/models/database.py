@@ -1,10 +1,13 @@
-from sqlalchemy import create_engine, Column, String, Float, Integer, Boolean, DateTime, Text, JSON
+from sqlalchemy import case, cast, column, literal, literal_column, create_engine, Column, String, Float, Integer, Boolean, Date, DateTime, Text, JSON, Index, func, insert, inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 from datetime import datetime
 import os
 
+from .schemas import CallStatus
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./call_auditor.db")
 
 # Configure engine based on database type
@@ -15,21 +18,34 @@ if DATABASE_URL.startswith("postgresql"):
         separator = "&" if "?" in DATABASE_URL else "?"
         DATABASE_URL = f"{DATABASE_URL}{separator}sslmode=require"
     
+    connect_args = {
+        "connect_timeout": 10,
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 5,
+    }
+    # PgBouncer in transaction mode (Supabase pooler, port 6543) can't route
+    # server-side prepared statements. The documented postgresql+psycopg:// URL
+    # selects psycopg 3, which prepares after a few executions unless told not
+    # to; plain postgresql:// URLs use psycopg2, which never prepares.
+    if DATABASE_URL.startswith("postgresql+psycopg:"):
+        connect_args["prepare_threshold"] = None
+
     engine = create_engine(
         DATABASE_URL,
         poolclass=NullPool,  # Best for serverless - let Supabase handle pooling
-        connect_args={
-            "connect_timeout": 10,
-            "keepalives": 1,
-            "keepalives_idle": 30,
-            "keepalives_interval": 10,
-            "keepalives_count": 5,
-        }
+        connect_args=connect_args,
     )
 else:
     # SQLite configuration (for local development)
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
+if DATABASE_URL.startswith("postgresql"):
+    from sqlalchemy.dialects.postgresql import insert as upsert
+else:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -39,13 +55,13 @@ class CallAnalysis(Base):
     __tablename__ = "call_analyses"
 
     id = Column(String, primary_key=True, index=True)
-    call_date = Column(DateTime, default=datetime.utcnow, index=True)
+    call_date = Column(DateTime, default=datetime.utcnow)
     audit_date = Column(DateTime, default=datetime.utcnow)
     duration_seconds = Column(Float)
     
     # Agent Info
     agent_id = Column(String, nullable=True, index=True)
-    agent_name = Column(String, nullable=True)
+    agent_name = Column(String, nullable=True, index=True)
     
     # Customer Info
     customer_name = Column(String, nullable=True)
@@ -69,7 +85,7 @@ class CallAnalysis(Base):
     
     # Intent & Insights
     customer_intent = Column(String)
-    key_issues = Column(JSON)
+    key_issues = Column(JSON().with_variant(JSONB, "postgresql"))
     resolution_status = Column(String)
     follow_up_required = Column(Boolean)
     
@@ -77,10 +93,213 @@ class CallAnalysis(Base):
     audio_file_path = Column(String, nullable=True)
     audio_storage_path = Column(String, nullable=True)
     recording_expires_at = Column(DateTime, nullable=True)
+    
+    # Processing state - transcription and analysis run after the upload returns
+    status = Column(String, nullable=False, default=CallStatus.COMPLETED.value, server_default=CallStatus.COMPLETED.value)
+    error_message = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # Serves both the newest-first call list and the 30-day dashboard range scan
+        Index("ix_call_analyses_call_date_desc", call_date.desc()),
+        Index("ix_call_analyses_key_issues_gin", key_issues, postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+
+# customer_sentiment fields extracted in SQL (json_extract on SQLite, ->> on PostgreSQL)
+SENTIMENT = CallAnalysis.customer_sentiment["overall_sentiment"].as_string()
+URGENCY = CallAnalysis.customer_sentiment["urgency_level"].as_string()
+ESCALATION_RISK = CallAnalysis.customer_sentiment["escalation_risk"].as_float()
+
+
+def json_elements(expr, value_type=None):
+    """
+    A JSON array column as a table-valued function with one "value" row per element;
+    JOIN it to call_analyses ON true to unnest it in SQL. Elements come back as text, or
+    as JSON when `value_type` is given. Anything but an array (SQL NULL, or the JSON null
+    stored for calls still processing or failed) unnests to no rows instead of an error.
+    """
+    value = column("value", value_type) if value_type is not None else "value"
+    if DATABASE_URL.startswith("postgresql"):
+        # Cast so this also works on json columns (and before migrate_db converts key_issues)
+        doc = cast(expr, JSONB)
+        array = case((func.jsonb_typeof(doc) == "array", doc), else_=cast(literal_column("'[]'"), JSONB))
+        unnest = func.jsonb_array_elements if value_type is not None else func.jsonb_array_elements_text
+        return unnest(array).table_valued(value).render_derived()
+    array = case((func.json_type(expr) == "array", expr), else_=literal_column("'[]'"))
+    return func.json_each(array).table_valued(value)
+
+
+KEY_ISSUES = json_elements(CallAnalysis.key_issues)
+QUESTION_SCORES = json_elements(CallAnalysis.question_scores, JSON)
+
+
+def iso_timestamp(column):
+    """Format a DateTime column as an ISO 8601 string (to seconds) in SQL"""
+    if DATABASE_URL.startswith("postgresql"):
+        return func.to_char(column, 'YYYY-MM-DD"T"HH24:MI:SS')
+    return func.strftime("%Y-%m-%dT%H:%M:%S", column)
+
+
+class DailyAgg(Base):
+    """Per-day call counters, maintained alongside call_analyses so the dashboard never rescans it"""
+    __tablename__ = "daily_agg"
+
+    day = Column(Date, primary_key=True)
+    agent_name = Column(String, primary_key=True)
+    sentiment = Column(String, primary_key=True)
+    urgency = Column(String, primary_key=True)
+
+    calls = Column(Integer, nullable=False, default=0)
+    total_score = Column(Float, nullable=False, default=0)
+    total_duration = Column(Float, nullable=False, default=0)
+    escalations = Column(Integer, nullable=False, default=0)
+
+
+DAILY_AGG_COUNTERS = ("calls", "total_score", "total_duration", "escalations")
+
+# daily_agg bucket for a call without an agent name, sentiment or urgency
+UNKNOWN_LABEL = "Unknown"
+
+
+def daily_agg_label(value):
+    """
+    SQL for a daily_agg grouping label: NULL or empty becomes UNKNOWN_LABEL. Both
+    record_daily_agg and rebuild_daily_agg go through it, so they pick the same bucket.
+    """
+    return func.coalesce(func.nullif(value, ""), UNKNOWN_LABEL)
+
+
+def record_daily_agg(db, record: CallAnalysis, sign: int = 1) -> None:
+    """
+    Add a call's contribution to its daily_agg bucket (or remove it with sign=-1).
+    Runs in the caller's transaction so the counters commit together with the call.
+    """
+    sentiment = record.customer_sentiment or {}
+    values = {
+        "day": (record.call_date or datetime.utcnow()).date(),
+        "agent_name": daily_agg_label(literal(record.agent_name, String)),
+        "sentiment": daily_agg_label(literal(sentiment.get("overall_sentiment"), String)),
+        "urgency": daily_agg_label(literal(sentiment.get("urgency_level"), String)),
+        "calls": sign,
+        "total_score": sign * (record.overall_percentage or 0),
+        "total_duration": sign * (record.duration_seconds or 0),
+        "escalations": sign * int((sentiment.get("escalation_risk") or 0) > 50),
+    }
+    stmt = upsert(DailyAgg).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyAgg.day, DailyAgg.agent_name, DailyAgg.sentiment, DailyAgg.urgency],
+        set_={c: getattr(DailyAgg, c) + stmt.excluded[c] for c in DAILY_AGG_COUNTERS},
+    )
+    db.execute(stmt)
+
+    if sign < 0:
+        db.query(DailyAgg).filter(DailyAgg.calls <= 0).delete(synchronize_session=False)
+
+
+def rebuild_daily_agg(db) -> None:
+    """Recompute daily_agg from scratch with a full GROUP BY over call_analyses"""
+    day = func.date(CallAnalysis.call_date)
+    agent = daily_agg_label(CallAnalysis.agent_name)
+    sentiment = daily_agg_label(SENTIMENT)
+    urgency = daily_agg_label(URGENCY)
+
+    totals = db.query(
+        day,
+        agent,
+        sentiment,
+        urgency,
+        func.count(),
+        func.sum(func.coalesce(CallAnalysis.overall_percentage, 0)),
+        func.sum(func.coalesce(CallAnalysis.duration_seconds, 0)),
+        func.count().filter(ESCALATION_RISK > 50),
+    ).filter(CallAnalysis.status == CallStatus.COMPLETED.value).group_by(day, agent, sentiment, urgency)
+
+    db.query(DailyAgg).delete(synchronize_session=False)
+    db.execute(insert(DailyAgg).from_select(
+        ["day", "agent_name", "sentiment", "urgency", *DAILY_AGG_COUNTERS],
+        totals.statement,
+    ))
+
+
+# Columns added to call_analyses after its first release, with the DDL to add them
+ADDED_COLUMNS = {
+    "status": "VARCHAR NOT NULL DEFAULT 'completed'",
+    "error_message": "TEXT",
+}
+
+
+# Any fixed key works; it only has to be the same for every instance of the app
+SCHEMA_LOCK_ID = 7_301_924
+
+_schema_ready = False
 
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    """
+    Bring the schema up to date: create missing tables, add columns introduced since the
+    first release and backfill daily_agg. Idempotent and cheap once applied, and runs at
+    most once per process. On PostgreSQL the whole step holds an advisory lock, so
+    instances cold-starting together apply it one after another instead of racing.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+
+    with engine.begin() as conn:
+        if DATABASE_URL.startswith("postgresql"):
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_ID})
+
+        Base.metadata.create_all(bind=conn)
+
+        # create_all doesn't alter existing tables, so add newer columns by hand
+        columns = {c["name"] for c in inspect(conn).get_columns(CallAnalysis.__tablename__)}
+        for name, ddl in ADDED_COLUMNS.items():
+            if name not in columns:
+                conn.execute(text(f"ALTER TABLE call_analyses ADD COLUMN {name} {ddl}"))
+
+        # Backfill daily_agg the first time it is deployed against existing calls
+        db = SessionLocal(bind=conn)
+        try:
+            if db.query(DailyAgg).first() is None and db.query(CallAnalysis.id).first() is not None:
+                rebuild_daily_agg(db)
+                db.flush()
+        finally:
+            db.close()
+
+    _schema_ready = True
+
+
+def migrate_db():
+    """
+    Deploy-time migration (python -m app.migrate): init_db plus the changes too slow for a
+    cold start - rewriting key_issues as jsonb and building the indexes that tables created
+    by earlier releases are missing.
+    """
+    init_db()
+    postgres = DATABASE_URL.startswith("postgresql")
+
+    if postgres:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_ID})
+            # key_issues became jsonb (for its GIN index); convert tables created while it was json.
+            # This rewrites the table under an exclusive lock, hence a migration and not startup
+            columns = {c["name"]: c["type"] for c in inspect(conn).get_columns(CallAnalysis.__tablename__)}
+            if not isinstance(columns["key_issues"], JSONB):
+                conn.execute(text(
+                    "ALTER TABLE call_analyses ALTER COLUMN key_issues TYPE jsonb USING key_issues::jsonb"
+                ))
+
+    # create_all skips tables that already exist, so add any indexes they are missing. On
+    # PostgreSQL they are built CONCURRENTLY (uploads and the dashboard keep running), which
+    # can't happen inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if postgres:
+                    # Only this migration process builds indexes, so the flag can't leak
+                    # into a create_all that runs in a transaction
+                    index.dialect_kwargs["postgresql_concurrently"] = True
+                index.create(bind=conn, checkfirst=True)
 
 
 def get_db():
@@ -89,3 +308,4 @@ def get_db():
         yield db
     finally:
         db.close()
+
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -31,6 +31,12 @@ class CallType(str, Enum):
     OUTGOING = "Outgoing"
 
 
+class CallStatus(str, Enum):
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 # Request Models
 class CallUploadRequest(BaseModel):
     agent_id: Optional[str] = None
@@ -47,7 +53,10 @@ class TranscriptionResult(BaseModel):
     language: str
 
 
+# Analysis sections are frozen: fallback defaults and cached analyses share instances
 class QuestionScore(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     category: str
     question: str
     answer: str
@@ -56,6 +65,8 @@ class QuestionScore(BaseModel):
 
 
 class AgentBehavior(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     calmness: bool
     confidence: bool
     politeness: bool
@@ -64,6 +75,8 @@ class AgentBehavior(BaseModel):
 
 
 class CustomerSentiment(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     overall_sentiment: SentimentType
     emotions: List[EmotionType]
     urgency_level: UrgencyLevel
@@ -74,6 +87,8 @@ class CustomerSentiment(BaseModel):
 
 
 class ComplianceRisk(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     fraud_suspected: bool
     compliance_risk: str  # low, medium, high
     trust_justification: str
@@ -114,6 +129,14 @@ class CallAnalysisResult(BaseModel):
     key_issues: List[str]
     resolution_status: str
     follow_up_required: bool
+    
+    status: CallStatus = CallStatus.COMPLETED
+
+
+class CallStatusResponse(BaseModel):
+    call_id: str
+    status: CallStatus
+    error: Optional[str] = None
 
 
 class DashboardMetrics(BaseModel):
@@ -1,88 +1,149 @@
 import os
+import io
 import uuid
+import shutil
+import asyncio
+import logging
 import tempfile
 from datetime import datetime, timedelta
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Header
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, HTTPException, Depends, Header
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import Optional, List
 
-from ..models.database import get_db, CallAnalysis
-from ..models.schemas import CallAnalysisResult, CallType
+from ..models.database import get_db, SessionLocal, CallAnalysis, SENTIMENT, iso_timestamp, record_daily_agg
+from ..models.schemas import CallAnalysisResult, CallStatusResponse, CallStatus, CallType
 from ..services.transcription import transcription_service
 from ..services.sentiment_analysis import sentiment_service
 from ..services.storage import storage_service
+from ..services.cache import dashboard_cache
 
 router = APIRouter(prefix="/api/calls", tags=["calls"])
 
+logger = logging.getLogger(__name__)
+
 # Retention period for recordings (in days)
 RECORDING_RETENTION_DAYS = 3
 
+# Uploads are copied to disk in chunks of this size (1 MB)
+UPLOAD_CHUNK_SIZE = 1 << 20
 
-@router.post("/upload", response_model=CallAnalysisResult)
-async def upload_and_analyze_call(
-    file: UploadFile = File(...),
-    agent_id: Optional[str] = Form(None),
-    agent_name: Optional[str] = Form(None),
-    customer_name: Optional[str] = Form(None),
-    customer_phone: Optional[str] = Form(None),
-    call_type: CallType = Form(CallType.INCOMING),
-    db: Session = Depends(get_db)
-):
+# A call still processing this long after upload lost its background task (e.g. to a
+# restart) and is reported as failed, so polling clients stop waiting
+PROCESSING_TIMEOUT = timedelta(minutes=15)
+PROCESSING_TIMEOUT_ERROR = "Analysis did not finish - please upload the call again"
+
+
+def _save_upload(src, dst_fd: int) -> None:
     """
-    Upload a call recording, transcribe it using Whisper, and analyze sentiment using GPT-3.5.
-    Audio is stored in Supabase Storage and automatically expires after 3 days.
+    Copy an upload's spooled file to the open descriptor dst_fd and close it
+    (blocking - run it in a thread). Once the upload has rolled over to a real file,
+    os.sendfile copies it inside the kernel; in-memory uploads fall back to a chunked copy.
     """
-    # Validate file type
-    allowed_types = ["audio/mpeg", "audio/wav", "audio/mp3", "audio/m4a", "audio/webm", "audio/ogg"]
-    if file.content_type not in allowed_types and not file.filename.endswith(('.mp3', '.wav', '.m4a', '.webm', '.ogg')):
-        raise HTTPException(status_code=400, detail="Invalid file type. Supported: mp3, wav, m4a, webm, ogg")
-    
-    # Generate unique call ID
-    call_id = str(uuid.uuid4())
-    
-    # Read file content
+    with os.fdopen(dst_fd, "wb") as dst:
+        if getattr(src, "_rolled", True) and hasattr(os, "sendfile"):
+            try:
+                src_fd = src.fileno()
+                size = os.fstat(src_fd).st_size
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                return
+            except (OSError, io.UnsupportedOperation):
+                # e.g. platforms where sendfile needs a socket destination
+                dst.seek(0)
+                dst.truncate()
+        src.seek(0)
+        shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+
+
+def _remove_temp_file(path: str) -> None:
+    """Delete a temp upload; one unlink instead of an exists() check followed by remove()"""
     try:
-        file_content = await file.read()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to read file: {str(e)}")
-    
-    # Save to temp file for Whisper API processing
-    file_extension = os.path.splitext(file.filename)[1] or ".mp3"
-    temp_fd, temp_path = tempfile.mkstemp(suffix=file_extension)
-    
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _insert_call(db: Session, record: CallAnalysis) -> None:
+    """Insert a call that is still processing (blocking - run it in a thread)"""
+    db.add(record)
+    db.commit()
+
+
+def _save_call(db: Session, record: CallAnalysis) -> None:
+    """Save a completed call and its daily_agg counters in one transaction (blocking - run it in a thread)"""
+    db.add(record)
+    record_daily_agg(db, record)
+    db.commit()
+
+
+def _mark_failed(db: Session, call_id: str, error: str) -> None:
+    """Flag a call whose analysis failed so polling clients can stop (blocking - run it in a thread)"""
+    db.query(CallAnalysis).filter(CallAnalysis.id == call_id).update(
+        {"status": CallStatus.FAILED.value, "error_message": error},
+        synchronize_session=False
+    )
+    db.commit()
+
+
+async def _transcribe_and_analyze(temp_path: str):
+    """Transcribe using Whisper (from the temp file), then analyze the text using GPT-3.5"""
+    transcription_result = await transcription_service.transcribe_audio(temp_path)
+    analysis_result = await sentiment_service.analyze_call(transcription_result["text"])
+    return transcription_result, analysis_result
+
+
+async def _run_analysis(call_id: str, temp_path: str, filename: str) -> None:
+    """
+    Store, transcribe and analyze an uploaded call, then fill in its row.
+    Runs as a background task once the upload response has been sent.
+    """
+    db = SessionLocal()
+    storage_path = None
     try:
-        # Write to temp file
-        with os.fdopen(temp_fd, 'wb') as f:
-            f.write(file_content)
-        
-        # Step 1: Upload to Supabase Storage
-        storage_path, expires_at = await storage_service.upload_audio(
-            file_content=file_content,
-            filename=file.filename,
-            call_id=call_id
+        # Upload to Supabase Storage while the recording is transcribed and analyzed -
+        # neither depends on the other, so the upload time overlaps the OpenAI calls
+        upload_result, analysis_outcome = await asyncio.gather(
+            storage_service.upload_audio(
+                file_path=temp_path,
+                filename=filename,
+                call_id=call_id
+            ),
+            _transcribe_and_analyze(temp_path),
+            return_exceptions=True
         )
+        if not isinstance(upload_result, BaseException):
+            storage_path, expires_at = upload_result
+        for outcome in (upload_result, analysis_outcome):
+            if isinstance(outcome, BaseException):
+                raise outcome
+        transcription_result, analysis_result = analysis_outcome
         
-        # Step 2: Transcribe using Whisper (from temp file)
-        transcription_result = await transcription_service.transcribe_audio(temp_path)
-        
-        # Step 3: Analyze using GPT-3.5
-        analysis_result = await sentiment_service.analyze_call(transcription_result["text"])
+        record = await asyncio.to_thread(db.get, CallAnalysis, call_id)
+        if record is None:
+            # Deleted while it was still processing
+            await storage_service.delete_audio(storage_path)
+            return
         
         # Calculate total scores
         total_score = sum(q.score for q in analysis_result["question_scores"])
         max_score = sum(q.max_score for q in analysis_result["question_scores"])
         overall_percentage = (total_score / max_score * 100) if max_score > 0 else 0
         
-        # Create result object
+        # Validate the analysis and serialize it once for the JSON columns
         result = CallAnalysisResult(
             call_id=call_id,
-            call_date=datetime.utcnow(),
+            call_date=record.call_date,
             audit_date=datetime.utcnow(),
             duration_seconds=transcription_result.get("duration", 0),
-            agent_id=agent_id,
-            agent_name=agent_name,
-            customer_name=customer_name,
-            customer_phone=customer_phone,
+            agent_id=record.agent_id,
+            agent_name=record.agent_name,
+            customer_name=record.customer_name,
+            customer_phone=record.customer_phone,
             transcription=transcription_result["text"],
             language=transcription_result.get("language", "unknown"),
             call_summary=analysis_result["call_summary"],
@@ -98,52 +159,109 @@ async def upload_and_analyze_call(
             resolution_status=analysis_result["resolution_status"],
             follow_up_required=analysis_result["follow_up_required"]
         )
+        payload = result.model_dump(mode="json")
         
         # Save to database
-        db_record = CallAnalysis(
-            id=call_id,
-            call_date=result.call_date,
-            audit_date=result.audit_date,
-            duration_seconds=result.duration_seconds,
-            agent_id=agent_id,
-            agent_name=agent_name,
-            customer_name=customer_name,
-            customer_phone=customer_phone,
-            transcription=result.transcription,
-            language=result.language,
-            call_summary=result.call_summary,
-            customer_sentiment=result.customer_sentiment.model_dump(),
-            agent_behavior=result.agent_behavior.model_dump(),
-            compliance_risk=result.compliance_risk.model_dump(),
-            question_scores=[q.model_dump() for q in result.question_scores],
-            total_score=result.total_score,
-            max_score=result.max_score,
-            overall_percentage=result.overall_percentage,
-            customer_intent=result.customer_intent,
-            key_issues=result.key_issues,
-            resolution_status=result.resolution_status,
-            follow_up_required=result.follow_up_required,
-            audio_storage_path=storage_path,
-            recording_expires_at=expires_at
-        )
-        db.add(db_record)
-        db.commit()
-        
-        return result
+        record.audit_date = result.audit_date
+        record.duration_seconds = result.duration_seconds
+        record.transcription = result.transcription
+        record.language = result.language
+        record.call_summary = result.call_summary
+        record.customer_sentiment = payload["customer_sentiment"]
+        record.agent_behavior = payload["agent_behavior"]
+        record.compliance_risk = payload["compliance_risk"]
+        record.question_scores = payload["question_scores"]
+        record.total_score = result.total_score
+        record.max_score = result.max_score
+        record.overall_percentage = result.overall_percentage
+        record.customer_intent = result.customer_intent
+        record.key_issues = result.key_issues
+        record.resolution_status = result.resolution_status
+        record.follow_up_required = result.follow_up_required
+        record.audio_storage_path = storage_path
+        record.recording_expires_at = expires_at
+        record.status = CallStatus.COMPLETED.value
+        await asyncio.to_thread(_save_call, db, record)
+        dashboard_cache.clear()
         
     except Exception as e:
+        logger.exception("Analysis failed for call %s", call_id)
+        db.rollback()
         # Clean up storage on error
         try:
-            if 'storage_path' in locals():
+            if storage_path:
                 await storage_service.delete_audio(storage_path)
         except Exception:
             pass
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        try:
+            await asyncio.to_thread(_mark_failed, db, call_id, f"Analysis failed: {str(e)}")
+        except Exception:
+            # The row stays "processing" until get_call_analysis times it out
+            logger.exception("Failed to record analysis failure for call %s", call_id)
     
     finally:
-        # Always clean up temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        db.close()
+        _remove_temp_file(temp_path)
+
+
+@router.post("/upload", response_model=CallStatusResponse, status_code=202)
+async def upload_and_analyze_call(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    agent_id: Optional[str] = Form(None),
+    agent_name: Optional[str] = Form(None),
+    customer_name: Optional[str] = Form(None),
+    customer_phone: Optional[str] = Form(None),
+    call_type: CallType = Form(CallType.INCOMING),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a call recording for transcription with Whisper and sentiment analysis with GPT-3.5.
+    Returns as soon as the file is saved; poll GET /api/calls/{call_id} until its status
+    is "completed" (or "failed").
+    Audio is stored in Supabase Storage and automatically expires after 3 days.
+    """
+    # Validate file type
+    allowed_types = ["audio/mpeg", "audio/wav", "audio/mp3", "audio/m4a", "audio/webm", "audio/ogg"]
+    if file.content_type not in allowed_types and not file.filename.endswith(('.mp3', '.wav', '.m4a', '.webm', '.ogg')):
+        raise HTTPException(status_code=400, detail="Invalid file type. Supported: mp3, wav, m4a, webm, ogg")
+    
+    # Generate unique call ID
+    call_id = str(uuid.uuid4())
+    
+    # Save to temp file for Whisper API processing, writing through the descriptor
+    # mkstemp already opened rather than closing and reopening it by path
+    file_extension = os.path.splitext(file.filename)[1] or ".mp3"
+    temp_fd, temp_path = tempfile.mkstemp(suffix=file_extension)
+    
+    # Copy the upload to disk off the event loop instead of reading it all into memory
+    try:
+        await asyncio.to_thread(_save_upload, file.file, temp_fd)
+    except Exception as e:
+        _remove_temp_file(temp_path)
+        raise HTTPException(status_code=500, detail=f"Failed to read file: {str(e)}")
+    
+    # Record the call as processing; the slow steps run after the response is sent
+    now = datetime.utcnow()
+    db_record = CallAnalysis(
+        id=call_id,
+        call_date=now,
+        audit_date=now,
+        agent_id=agent_id,
+        agent_name=agent_name,
+        customer_name=customer_name,
+        customer_phone=customer_phone,
+        status=CallStatus.PROCESSING.value
+    )
+    try:
+        await asyncio.to_thread(_insert_call, db, db_record)
+    except Exception as e:
+        _remove_temp_file(temp_path)
+        raise HTTPException(status_code=500, detail=f"Failed to save call: {str(e)}")
+    
+    background_tasks.add_task(_run_analysis, call_id, temp_path, file.filename)
+    
+    return {"call_id": call_id, "status": CallStatus.PROCESSING}
 
 
 @router.get("/{call_id}", response_model=CallAnalysisResult)
@@ -153,38 +271,58 @@ async def get_call_analysis(call_id: str, db: Session = Depends(get_db)):
     if not record:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    from ..models.schemas import CustomerSentiment, AgentBehavior, ComplianceRisk, QuestionScore
+    status, error = record.status, record.error_message
+    if (
+        status == CallStatus.PROCESSING.value
+        and record.audit_date
+        and record.audit_date < datetime.utcnow() - PROCESSING_TIMEOUT
+    ):
+        await asyncio.to_thread(_mark_failed, db, call_id, PROCESSING_TIMEOUT_ERROR)
+        status, error = CallStatus.FAILED.value, PROCESSING_TIMEOUT_ERROR
     
-    return CallAnalysisResult(
-        call_id=record.id,
-        call_date=record.call_date,
-        audit_date=record.audit_date,
-        duration_seconds=record.duration_seconds,
-        agent_id=record.agent_id,
-        agent_name=record.agent_name,
-        customer_name=record.customer_name,
-        customer_phone=record.customer_phone,
-        transcription=record.transcription,
-        language=record.language,
-        call_summary=record.call_summary,
-        customer_sentiment=CustomerSentiment(**record.customer_sentiment),
-        agent_behavior=AgentBehavior(**record.agent_behavior),
-        compliance_risk=ComplianceRisk(**record.compliance_risk),
-        question_scores=[QuestionScore(**q) for q in record.question_scores],
-        total_score=record.total_score,
-        max_score=record.max_score,
-        overall_percentage=record.overall_percentage,
-        customer_intent=record.customer_intent,
-        key_issues=record.key_issues,
-        resolution_status=record.resolution_status,
-        follow_up_required=record.follow_up_required
-    )
+    # Still processing (202) or failed - there is no analysis to return yet
+    if status != CallStatus.COMPLETED.value:
+        return ORJSONResponse(
+            {"call_id": call_id, "status": status, "error": error},
+            status_code=202 if status == CallStatus.PROCESSING.value else 200
+        )
+    
+    # The JSON columns were stored from CallAnalysisResult.model_dump(mode="json"), so the
+    # row is already in response shape - pass it through without rebuilding the models
+    return ORJSONResponse({
+        "call_id": record.id,
+        "call_date": record.call_date,
+        "audit_date": record.audit_date,
+        "duration_seconds": record.duration_seconds,
+        "agent_id": record.agent_id,
+        "agent_name": record.agent_name,
+        "customer_name": record.customer_name,
+        "customer_phone": record.customer_phone,
+        "transcription": record.transcription,
+        "language": record.language,
+        "call_summary": record.call_summary,
+        "customer_sentiment": record.customer_sentiment,
+        "agent_behavior": record.agent_behavior,
+        "compliance_risk": record.compliance_risk,
+        "question_scores": record.question_scores,
+        "total_score": record.total_score,
+        "max_score": record.max_score,
+        "overall_percentage": record.overall_percentage,
+        "customer_intent": record.customer_intent,
+        "key_issues": record.key_issues,
+        "resolution_status": record.resolution_status,
+        "follow_up_required": record.follow_up_required,
+        "status": record.status
+    })
 
 
 @router.get("/{call_id}/audio-url")
 async def get_audio_url(call_id: str, db: Session = Depends(get_db)):
     """Get a signed URL for the call recording audio"""
-    record = db.query(CallAnalysis).filter(CallAnalysis.id == call_id).first()
+    record = db.query(
+        CallAnalysis.audio_storage_path,
+        CallAnalysis.recording_expires_at
+    ).filter(CallAnalysis.id == call_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Call not found")
     
@@ -213,19 +351,33 @@ async def list_calls(
     db: Session = Depends(get_db)
 ):
     """List all analyzed calls"""
-    records = db.query(CallAnalysis).order_by(CallAnalysis.call_date.desc()).offset(skip).limit(limit).all()
+    # Select only the listed columns - transcription and the analysis JSON are never loaded
+    records = db.query(
+        CallAnalysis.id,
+        CallAnalysis.agent_name,
+        CallAnalysis.customer_name,
+        iso_timestamp(CallAnalysis.call_date).label("call_date"),
+        CallAnalysis.duration_seconds,
+        CallAnalysis.overall_percentage,
+        SENTIMENT.label("sentiment"),
+        CallAnalysis.resolution_status,
+        CallAnalysis.audio_storage_path,
+        iso_timestamp(CallAnalysis.recording_expires_at).label("recording_expires_at"),
+        CallAnalysis.status
+    ).order_by(CallAnalysis.call_date.desc()).offset(skip).limit(limit).all()
     
     return [{
         "id": r.id,
         "agent_name": r.agent_name or "Unknown",
         "customer_name": r.customer_name or "Unknown",
-        "call_date": r.call_date.isoformat(),
+        "call_date": r.call_date,
         "duration": r.duration_seconds,
         "overall_score": r.overall_percentage,
-        "sentiment": r.customer_sentiment.get("overall_sentiment", "Unknown") if r.customer_sentiment else "Unknown",
+        "sentiment": r.sentiment or "Unknown",
         "resolution_status": r.resolution_status,
         "has_recording": bool(r.audio_storage_path),
-        "recording_expires_at": r.recording_expires_at.isoformat() if r.recording_expires_at else None
+        "recording_expires_at": r.recording_expires_at,
+        "status": r.status
     } for r in records]
 
 
@@ -243,9 +395,12 @@ async def delete_call(call_id: str, db: Session = Depends(get_db)):
         except Exception as e:
             print(f"Warning: Could not delete audio file: {e}")
     
-    # Delete database record
+    # Delete database record (only completed calls were counted in daily_agg)
+    if record.status == CallStatus.COMPLETED.value:
+        record_daily_agg(db, record, sign=-1)
     db.delete(record)
     db.commit()
+    dashboard_cache.clear()
     
     return {"message": "Call deleted successfully"}
 
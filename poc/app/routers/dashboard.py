@@ -1,26 +1,110 @@
-from fastapi import APIRouter, Depends
+import os
+import heapq
+from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Dict, Any, List
+from sqlalchemy import select, bindparam, func, case, true
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from collections import defaultdict
 
-from ..models.database import get_db, CallAnalysis
-from ..models.schemas import DashboardMetrics
+from ..models.database import (
+    get_db, CallAnalysis, DailyAgg, SENTIMENT, ESCALATION_RISK, KEY_ISSUES, QUESTION_SCORES, UNKNOWN_LABEL,
+    iso_timestamp, rebuild_daily_agg
+)
+from ..models.schemas import DashboardMetrics, CallStatus
+from ..services.cache import dashboard_cache
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
+# Escalation risk histogram buckets (upper bound inclusive), bucketed in SQL
+RISK_BUCKETS = ["0-20%", "20-40%", "40-60%", "60-80%", "80-100%"]
+_risk = func.coalesce(ESCALATION_RISK, 0)
+RISK_BUCKET = case(
+    (_risk <= 20, "0-20%"),
+    (_risk <= 40, "20-40%"),
+    (_risk <= 60, "40-60%"),
+    (_risk <= 80, "60-80%"),
+    else_="80-100%"
+)
+
+_completed = CallAnalysis.status == CallStatus.COMPLETED.value
+
+# Dashboard statements are built once at import time; SQLAlchemy's compiled
+# cache then reuses their SQL on every request instead of recompiling.
+_positive_calls = func.sum(DailyAgg.calls).filter(DailyAgg.sentiment == "Positive")
+_negative_calls = func.sum(DailyAgg.calls).filter(DailyAgg.sentiment == "Negative")
+
+TOTALS_STMT = select(
+    func.sum(DailyAgg.calls),
+    func.sum(DailyAgg.total_score),
+    func.sum(DailyAgg.total_duration),
+    func.sum(DailyAgg.escalations),
+    _positive_calls,
+)
+# Calls without a sentiment are left out of the distributions, as they always have been
+SENTIMENT_STMT = select(DailyAgg.sentiment, func.sum(DailyAgg.calls)).where(
+    DailyAgg.sentiment != UNKNOWN_LABEL
+).group_by(DailyAgg.sentiment)
+URGENCY_STMT = select(DailyAgg.urgency, func.sum(DailyAgg.calls)).where(
+    DailyAgg.urgency != UNKNOWN_LABEL
+).group_by(DailyAgg.urgency)
+AGENT_STMT = select(
+    DailyAgg.agent_name,
+    func.sum(DailyAgg.calls),
+    func.sum(DailyAgg.total_score),
+    _positive_calls,
+    _negative_calls,
+).group_by(DailyAgg.agent_name)
+DAILY_STMT = select(
+    DailyAgg.day,
+    func.sum(DailyAgg.calls),
+    func.sum(DailyAgg.total_score),
+    _positive_calls,
+    _negative_calls,
+).where(DailyAgg.day >= bindparam("since")).group_by(DailyAgg.day).order_by(DailyAgg.day)
+RISK_STMT = select(RISK_BUCKET, func.count()).where(_completed, SENTIMENT.isnot(None)).group_by(RISK_BUCKET)
+_issue = KEY_ISSUES.c.value
+TOP_ISSUES_STMT = select(_issue, func.count()).select_from(CallAnalysis).join(KEY_ISSUES, true()).where(
+    _completed, _issue.isnot(None)
+).group_by(_issue).order_by(func.count().desc()).limit(10)
+_question = QUESTION_SCORES.c.value
+_category = func.coalesce(_question["category"].as_string(), "Unknown")
+CATEGORY_SCORES_STMT = select(
+    _category,
+    func.sum(func.coalesce(_question["score"].as_float(), 0)),
+    func.sum(func.coalesce(_question["max_score"].as_float(), 0)),
+).select_from(CallAnalysis).join(QUESTION_SCORES, true()).where(_completed).group_by(_category)
+RECENT_CALLS_STMT = select(
+    CallAnalysis.id,
+    CallAnalysis.agent_name,
+    CallAnalysis.customer_name,
+    iso_timestamp(CallAnalysis.call_date).label("call_date"),
+    CallAnalysis.duration_seconds,
+    CallAnalysis.overall_percentage,
+    SENTIMENT.label("sentiment"),
+    CallAnalysis.resolution_status
+).where(_completed).order_by(CallAnalysis.call_date.desc()).limit(10)
+
 
 @router.get("/all-data")
 async def get_all_dashboard_data(db: Session = Depends(get_db)):
     """
     OPTIMIZED: Single API call that returns ALL dashboard data.
     Reduces multiple API calls to just one for faster loading.
+    The payload is cached for a few seconds and cleared when calls change.
     """
-    # Single query - load all records once
-    records = db.query(CallAnalysis).order_by(CallAnalysis.call_date.desc()).all()
+    data = dashboard_cache.get("all-data")
+    if data is None:
+        data = _aggregate_dashboard_data(db)
+        dashboard_cache.set("all-data", data)
+    return data
+
+
+def _aggregate_dashboard_data(db: Session) -> Dict[str, Any]:
+    """Compute every dashboard section from the database"""
+    # Headline metrics - summed from the pre-aggregated daily_agg counters
+    total_calls, total_score, total_duration, high_escalation, positive_calls = db.execute(TOTALS_STMT).one()
     
-    if not records:
+    if not total_calls:
         return {
             "metrics": {
                 "total_calls": 0,
@@ -32,129 +116,81 @@ async def get_all_dashboard_data(db: Session = Depends(get_db)):
             "sentiment_pie": {"labels": [], "values": []},
             "urgency_distribution": {"labels": [], "values": []},
             "agent_performance": [],
-            "daily_trends": {"dates": [], "calls": [], "avg_scores": []},
+            "daily_trends": {"dates": [], "calls": [], "avg_scores": [], "positive": [], "negative": []},
             "category_scores": [],
             "escalation_risk": {"labels": [], "values": []},
+            "top_issues": [],
             "recent_calls": []
         }
     
-    # Calculate all metrics in one pass
-    total_calls = len(records)
-    total_score = 0
-    total_duration = 0
+    # Sentiment / urgency distributions
+    sentiment_counts = dict(db.execute(SENTIMENT_STMT).all())
+    urgency_counts = dict(db.execute(URGENCY_STMT).all())
+    
+    # Agent performance
+    agent_rows = db.execute(AGENT_STMT).all()
     
-    sentiment_counts = defaultdict(int)
-    urgency_counts = defaultdict(int)
-    escalation_risks = []
-    agent_data = defaultdict(lambda: {"scores": [], "sentiments": defaultdict(int)})
-    category_data = defaultdict(lambda: {"total_score": 0, "max_score": 0})
-    risk_buckets = {"0-20%": 0, "20-40%": 0, "40-60%": 0, "60-80%": 0, "80-100%": 0}
+    # Daily trends for the last 30 days
+    thirty_days_ago = (datetime.utcnow() - timedelta(days=30)).date()
+    daily_rows = db.execute(DAILY_STMT, {"since": thirty_days_ago}).all()
     
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    daily_data = defaultdict(lambda: {"calls": 0, "total_score": 0, "positive": 0, "negative": 0})
+    # Escalation risk histogram
+    risk_counts = dict(db.execute(RISK_STMT).all())
+    risk_buckets = {bucket: risk_counts.get(bucket, 0) for bucket in RISK_BUCKETS}
     
-    for r in records:
-        total_score += r.overall_percentage or 0
-        total_duration += r.duration_seconds or 0
-        
-        # Agent data
-        agent = r.agent_name or "Unknown"
-        agent_data[agent]["scores"].append(r.overall_percentage or 0)
-        
-        # Sentiment data
-        if r.customer_sentiment:
-            sentiment = r.customer_sentiment.get("overall_sentiment", "Unknown")
-            sentiment_counts[sentiment] += 1
-            agent_data[agent]["sentiments"][sentiment] += 1
-            
-            urgency = r.customer_sentiment.get("urgency_level", "Unknown")
-            urgency_counts[urgency] += 1
-            
-            risk = r.customer_sentiment.get("escalation_risk", 0)
-            escalation_risks.append(risk)
-            
-            # Risk buckets
-            if risk <= 20:
-                risk_buckets["0-20%"] += 1
-            elif risk <= 40:
-                risk_buckets["20-40%"] += 1
-            elif risk <= 60:
-                risk_buckets["40-60%"] += 1
-            elif risk <= 80:
-                risk_buckets["60-80%"] += 1
-            else:
-                risk_buckets["80-100%"] += 1
-        
-        # Category scores
-        if r.question_scores:
-            for q in r.question_scores:
-                cat = q.get("category", "Unknown")
-                category_data[cat]["total_score"] += q.get("score", 0)
-                category_data[cat]["max_score"] += q.get("max_score", 0)
-        
-        # Daily trends
-        if r.call_date and r.call_date >= thirty_days_ago:
-            day = r.call_date.strftime("%Y-%m-%d")
-            daily_data[day]["calls"] += 1
-            daily_data[day]["total_score"] += r.overall_percentage or 0
-            if r.customer_sentiment:
-                s = r.customer_sentiment.get("overall_sentiment", "")
-                if s == "Positive":
-                    daily_data[day]["positive"] += 1
-                elif s == "Negative":
-                    daily_data[day]["negative"] += 1
+    # Top 10 key issues - key_issues arrays unnested and counted in SQL
+    issue_rows = db.execute(TOP_ISSUES_STMT).all()
+    
+    # Category scores - question_scores arrays unnested and summed per category in SQL
+    category_rows = db.execute(CATEGORY_SCORES_STMT).all()
     
     # Calculate final metrics
-    avg_score = total_score / total_calls if total_calls > 0 else 0
-    avg_duration = total_duration / total_calls if total_calls > 0 else 0
-    high_escalation = sum(1 for risk in escalation_risks if risk > 50)
-    escalation_rate = (high_escalation / total_calls * 100) if total_calls > 0 else 0
-    positive_rate = (sentiment_counts.get("Positive", 0) / total_calls * 100) if total_calls > 0 else 0
+    avg_score = total_score / total_calls
+    avg_duration = total_duration / total_calls
+    escalation_rate = high_escalation / total_calls * 100
+    positive_rate = (positive_calls or 0) / total_calls * 100
     
-    # Format agent performance
-    agent_performance = []
-    for agent, data in agent_data.items():
-        avg = sum(data["scores"]) / len(data["scores"]) if data["scores"] else 0
-        agent_performance.append({
-            "agent": agent,
-            "avg_score": round(avg, 2),
-            "total_calls": len(data["scores"]),
-            "positive_calls": data["sentiments"].get("Positive", 0),
-            "negative_calls": data["sentiments"].get("Negative", 0)
-        })
-    agent_performance.sort(key=lambda x: -x["avg_score"])
+    # Format agent performance - only the top 10 by score are returned, so select
+    # them with a bounded heap instead of sorting every agent
+    agent_performance = heapq.nlargest(10, ({
+        "agent": agent,
+        "avg_score": round(score / calls, 2),
+        "total_calls": calls,
+        "positive_calls": positive or 0,
+        "negative_calls": negative or 0
+    } for agent, calls, score, positive, negative in agent_rows), key=lambda x: x["avg_score"])
     
     # Format category scores
     category_scores = []
-    for cat, data in category_data.items():
-        pct = (data["total_score"] / data["max_score"] * 100) if data["max_score"] > 0 else 0
+    for cat, score, max_score in category_rows:
+        pct = (score / max_score * 100) if max_score > 0 else 0
         category_scores.append({
             "category": cat,
-            "avg_percentage": round(pct, 2)
+            "avg_percentage": round(float(pct), 2)
         })
     category_scores.sort(key=lambda x: -x["avg_percentage"])
     
     # Format daily trends
-    dates = sorted(daily_data.keys())
-    daily_trends = {
-        "dates": dates,
-        "calls": [daily_data[d]["calls"] for d in dates],
-        "avg_scores": [daily_data[d]["total_score"] / daily_data[d]["calls"] if daily_data[d]["calls"] > 0 else 0 for d in dates],
-        "positive": [daily_data[d]["positive"] for d in dates],
-        "negative": [daily_data[d]["negative"] for d in dates]
-    }
+    daily_trends = {"dates": [], "calls": [], "avg_scores": [], "positive": [], "negative": []}
+    for day, calls, score, positive, negative in daily_rows:
+        daily_trends["dates"].append(day.strftime("%Y-%m-%d"))
+        daily_trends["calls"].append(calls)
+        daily_trends["avg_scores"].append(score / calls)
+        daily_trends["positive"].append(positive or 0)
+        daily_trends["negative"].append(negative or 0)
     
     # Recent calls for quick view
+    records = db.execute(RECENT_CALLS_STMT).all()
     recent_calls = [{
         "id": r.id,
         "agent_name": r.agent_name or "Unknown",
         "customer_name": r.customer_name or "Unknown",
-        "call_date": r.call_date.isoformat() if r.call_date else None,
+        "call_date": r.call_date,
         "duration": r.duration_seconds,
         "overall_score": r.overall_percentage,
-        "sentiment": r.customer_sentiment.get("overall_sentiment", "Unknown") if r.customer_sentiment else "Unknown",
+        "sentiment": r.sentiment or "Unknown",
         "resolution_status": r.resolution_status
-    } for r in records[:10]]
+    } for r in records]
     
     return {
         "metrics": {
@@ -172,13 +208,14 @@ async def get_all_dashboard_data(db: Session = Depends(get_db)):
             "labels": list(urgency_counts.keys()),
             "values": list(urgency_counts.values())
         },
-        "agent_performance": agent_performance[:10],
+        "agent_performance": agent_performance,
         "daily_trends": daily_trends,
         "category_scores": category_scores,
         "escalation_risk": {
             "labels": list(risk_buckets.keys()),
             "values": list(risk_buckets.values())
         },
+        "top_issues": [{"issue": issue, "count": count} for issue, count in issue_rows],
         "recent_calls": recent_calls
     }
 
@@ -188,6 +225,7 @@ async def get_all_dashboard_data(db: Session = Depends(get_db)):
 async def get_dashboard_metrics(db: Session = Depends(get_db)):
     """Get aggregated metrics (use /all-data instead for better performance)"""
     data = await get_all_dashboard_data(db)
+    trends = data["daily_trends"]
     return DashboardMetrics(
         total_calls=data["metrics"]["total_calls"],
         avg_score=data["metrics"]["avg_score"],
@@ -195,7 +233,36 @@ async def get_dashboard_metrics(db: Session = Depends(get_db)):
         urgency_distribution=dict(zip(data["urgency_distribution"]["labels"], data["urgency_distribution"]["values"])),
         escalation_rate=data["metrics"]["escalation_rate"],
         avg_call_duration=data["metrics"]["avg_call_duration"],
-        top_issues=[],
+        top_issues=data["top_issues"],
         agent_performance=data["agent_performance"],
-        daily_trends=[]
+        daily_trends=[
+            {"date": date, "calls": calls, "avg_score": avg_score, "positive": positive, "negative": negative}
+            for date, calls, avg_score, positive, negative in zip(
+                trends["dates"], trends["calls"], trends["avg_scores"], trends["positive"], trends["negative"]
+            )
+        ]
     )
+
+
+@router.post("/admin/rebuild")
+async def rebuild_dashboard_aggregates(
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Recompute the daily_agg table from every stored call.
+    Protected by CRON_SECRET environment variable.
+    """
+    cron_secret = os.getenv("CRON_SECRET")
+    if cron_secret:
+        if not authorization or authorization != f"Bearer {cron_secret}":
+            raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    rebuild_daily_agg(db)
+    db.commit()
+    dashboard_cache.clear()
+    
+    return {
+        "message": "Dashboard aggregates rebuilt",
+        "timestamp": datetime.utcnow().isoformat()
+    }
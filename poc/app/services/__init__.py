@@ -1,3 +1,4 @@
 from .transcription import transcription_service
 from .sentiment_analysis import sentiment_service
 from .storage import storage_service
+from .cache import dashboard_cache, analysis_cache
@@ -0,0 +1,49 @@
+"""
+In-process TTL cache for expensive read paths.
+Every serverless instance keeps its own copy, so entries also expire on a timer
+to bound staleness when another instance changes the data.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """LRU cache whose entries expire `ttl` seconds after they are stored"""
+    
+    def __init__(self, maxsize: int = 128, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or `default` if missing or expired"""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._data.clear()
+
+
+# Dashboard payload - cleared whenever calls are added or removed
+dashboard_cache = TTLCache(maxsize=1, ttl=30)
+
+# GPT call analyses keyed by a hash of model + prompt version + transcription,
+# so re-processing an identical recording skips the OpenAI round trip
+analysis_cache = TTLCache(maxsize=256, ttl=24 * 60 * 60)
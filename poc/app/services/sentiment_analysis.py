@@ -2,16 +2,24 @@
 Async Sentiment Analysis Service
 
 Production-ready async sentiment analysis using OpenAI SDK v1.
-Features: parallel execution, retries, concurrency control, timeouts.
+Features: single JSON-mode request per call, retries, concurrency control, timeouts.
 """
 import os
+import copy
 import json
+import math
 import asyncio
+import hashlib
 import logging
-import math
-from typing import Any, Dict, List, Optional, Callable, Coroutine
+import time
+import functools
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from openai import AsyncOpenAI  # OpenAI SDK v1 async client
+import orjson
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient  # OpenAI SDK v1 async client
+from openai import APIConnectionError, InternalServerError, RateLimitError
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
 # Import your existing schema classes (assumed present in your project)
 from ..models.schemas import (
@@ -23,10 +31,366 @@ from ..models.schemas import (
     UrgencyLevel,
     EmotionType,
 )
+from .cache import analysis_cache
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Part of the analysis cache key - bump whenever the prompt or questionnaire changes
+# so analyses produced by the old prompt are no longer served
+PROMPT_VERSION = "3"
+
+
+# Audit questionnaire - static, so the list, the prompt text listing it and the
+# all-zero fallback scores are built once at import instead of per call
+_QUESTIONNAIRE: Tuple[Dict[str, Any], ...] = (
+    # Call Opening
+    {"category": "Call Opening", "question": "Did agent probe customer name before continuing?", "max_score": 3},
+    {"category": "Call Opening", "question": "Did agent open call as per timelines and script?", "max_score": 3},
+    {"category": "Call Opening", "question": "Did agent give opening within 5 seconds?", "max_score": 2},
+    {"category": "Call Opening", "question": "Did agent greet according to language selection?", "max_score": 2},
+    # Soft Skills
+    {"category": "Soft Skills", "question": "Did agent willingly help without making commitments?", "max_score": 3},
+    {"category": "Soft Skills", "question": "Did agent use proper sentence structure and grammar?", "max_score": 3},
+    {"category": "Soft Skills", "question": "Was agent confident during the call?", "max_score": 3},
+    {"category": "Soft Skills", "question": "Did agent show empathy towards customer?", "max_score": 4},
+    {"category": "Soft Skills", "question": "Did agent maintain professional tone throughout?", "max_score": 3},
+    # Probing & Understanding
+    {"category": "Probing & Understanding", "question": "Did agent ask effective questions to understand needs?", "max_score": 4},
+    {"category": "Probing & Understanding", "question": "Did agent understand customer concern at first instance?", "max_score": 3},
+    {"category": "Probing & Understanding", "question": "Did agent ask pertinent diagnostic questions?", "max_score": 3},
+    # Problem Resolution
+    {"category": "Problem Resolution", "question": "Did agent provide accurate information?", "max_score": 5},
+    {"category": "Problem Resolution", "question": "Did agent offer appropriate solutions?", "max_score": 5},
+    {"category": "Problem Resolution", "question": "Did agent handle objections effectively?", "max_score": 4},
+    # Call Closing
+    {"category": "Call Closing", "question": "Did agent follow correct closing format?", "max_score": 3},
+    {"category": "Call Closing", "question": "Did agent summarize the call properly?", "max_score": 3},
+    {"category": "Call Closing", "question": "Did agent ask for further assistance?", "max_score": 2},
+    # Critical Parameters
+    {"category": "Critical Parameters", "question": "Did agent NOT disconnect without warning?", "max_score": 10},
+    {"category": "Critical Parameters", "question": "Did agent use correct categorization?", "max_score": 5},
+)
+
+# One question_scores entry per line, with category/question/max_score spelled out so the
+# model copies them verbatim (the dashboard groups scores by category)
+_QUESTIONS_TEXT = "\n".join(
+    f'{{"category": "{q["category"]}", "question": "{q["question"]}", "answer": "...", '
+    f'"score": <0-{q["max_score"]}>, "max_score": {q["max_score"]}}}'
+    for q in _QUESTIONNAIRE
+)
+
+_DEFAULT_QUESTION_SCORES: List[QuestionScore] = [
+    QuestionScore(
+        category=q["category"],
+        question=q["question"],
+        answer="Unable to assess",
+        score=0,
+        max_score=q["max_score"],
+    )
+    for q in _QUESTIONNAIRE
+]
+
+# Analysis used for sections (or whole calls) the model's output doesn't cover. Built once:
+# the section models are frozen, so every fallback shares these instances
+_DEFAULT_ANALYSIS: Dict[str, Any] = {
+    "customer_sentiment": CustomerSentiment(
+        overall_sentiment=SentimentType.NEUTRAL,
+        emotions=[EmotionType.CALM],
+        urgency_level=UrgencyLevel.MEDIUM,
+        frustration_indicator=False,
+        escalation_risk=0,
+        call_opening_emotion=EmotionType.CALM,
+        call_end_emotion=EmotionType.CALM,
+    ),
+    "agent_behavior": AgentBehavior(
+        calmness=True, confidence=True, politeness=True, empathy=True, proper_grammar=True
+    ),
+    "compliance_risk": ComplianceRisk(fraud_suspected=False, compliance_risk="low", trust_justification="Unable to assess"),
+    "question_scores": _DEFAULT_QUESTION_SCORES,
+    "call_summary": "Summary not available.",
+    "customer_intent": "Unknown",
+    "key_issues": [],
+    "resolution_status": "Unknown",
+    "follow_up_required": False,
+}
+
+
+# Everything static goes in the system message and the user message is only the transcription.
+# The identical ~1.3K-token prefix then qualifies for OpenAI's automatic prompt caching
+# (prefixes over 1024 tokens), which bills the cached part at half price and cuts latency
+_SYSTEM_ROLE = (
+    "You are a call center quality auditor. Analyze customer sentiment, agent behavior, "
+    "compliance risk and intent, and score calls fairly based on the evidence in the "
+    "transcription. Always respond with valid JSON only."
+)
+_ANALYSIS_SPEC = (
+    """"customer_sentiment": object with
+- overall_sentiment: one of "Positive", "Neutral", "Negative", "Mixed"
+- emotions: array of emotions detected, each one of: "Calm", "Cooperative", "Confused", "Angry", "Frustrated", "Satisfied"
+- urgency_level: one of "High", "Medium", "Low"
+- frustration_indicator: boolean
+- escalation_risk: number between 0-100 representing percentage
+- call_opening_emotion: one of "Calm", "Cooperative", "Confused", "Angry", "Frustrated", "Satisfied"
+- call_end_emotion: one of "Calm", "Cooperative", "Confused", "Angry", "Frustrated", "Satisfied"
+
+"agent_behavior": object with these boolean fields
+- calmness: was the agent calm throughout?
+- confidence: did the agent sound confident?
+- politeness: was the agent polite?
+- empathy: did the agent show empathy?
+- proper_grammar: did the agent use proper grammar?
+
+"compliance_risk": object with
+- fraud_suspected: boolean indicating if fraud is suspected
+- compliance_risk: one of "low", "medium", "high"
+- trust_justification: brief explanation of the risk assessment
+
+"call_summary": brief 2-3 sentence summary focusing on the customer's issue, what action was taken, and the outcome
+
+"customer_intent": customer's primary intent (e.g., "Complaint", "Query", "Feedback", "Request")
+"key_issues": array of specific issues raised
+"resolution_status": one of "Resolved", "Partially Resolved", "Unresolved", "Requires Follow-up"
+"follow_up_required": boolean
+
+"question_scores": array with exactly one object per question below, in the same order
+- category, question, max_score: copied exactly as given
+- score: points earned (0 to max_score)
+- answer: brief explanation (Yes/No/NA with reason)
+
+Questions:
+"""
+    + _QUESTIONS_TEXT
+)
+_SYSTEM_PROMPT = (
+    _SYSTEM_ROLE
+    + "\n\nThe user message is a customer service call transcription. Analyze it and return "
+    "a JSON object with these exact keys:\n\n"
+    + _ANALYSIS_SPEC
+    + "\n\nReturn ONLY valid JSON, no other text."
+)
+
+# Packed prompts (analyze_calls) carry several calls in the user message, each as a "---" block
+_PACKED_SYSTEM_PROMPT = (
+    _SYSTEM_ROLE
+    + "\n\nThe user message holds several customer service call transcriptions, each starting "
+    "with a \"CALL <id>:\" line. Analyze each call on its own and return a JSON object that maps "
+    "every call id to an analysis object with these exact keys:\n\n"
+    + _ANALYSIS_SPEC
+    + "\n\nReturn ONLY valid JSON, no other text."
+)
+_PACKED_CALL_BLOCK = "---\nCALL {call_id}:\n{transcription}\n"
+
+
+# Completion settings shared by real-time and Batch API analyses. The JSON for all
+# sections (20 scored questions included) runs ~1.3K tokens; cap it a little above that
+ANALYSIS_MAX_TOKENS = 1800
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+# Transcriptions longer than this many tokens are cut down to their opening and closing
+# (both scored by the questionnaire) so prompt + output stay inside gpt-3.5-turbo's 16K context
+TRANSCRIPTION_TOKEN_BUDGET = 12000
+_TRANSCRIPTION_HEAD_TOKENS = 8000
+_TRANSCRIPTION_TAIL_TOKENS = 4000
+_TRUNCATION_MARKER = "\n[... middle of the call omitted ...]\n"
+_CHARS_PER_TOKEN = 4  # rough English average, used when tiktoken is unavailable
+_ENCODER_RETRY_SECONDS = 300.0  # wait before retrying a tiktoken load (e.g. BPE download) that failed
+
+# Model per workload, each overridable with OPENAI_MODEL_<WORKLOAD> (e.g. OPENAI_MODEL_PACKED).
+# Uploads ("realtime") and Batch API re-audits ("batch") keep the model existing scores came
+# from. Packed bulk analysis (analyze_calls) uses gpt-4o-mini: cheaper per token, and its 16K
+# completion limit fits many more analyses per request than gpt-3.5-turbo's 4K
+DEFAULT_MODELS = {
+    "realtime": "gpt-3.5-turbo",
+    "packed": "gpt-4o-mini",
+    "batch": "gpt-3.5-turbo",
+}
+
+# analyze_calls packs short transcriptions into shared requests of up to this many input
+# tokens, and as many analyses as the model's completion limit holds
+PACKED_INPUT_TOKEN_BUDGET = 12000
+_MAX_OUTPUT_TOKENS = {"gpt-3.5-turbo": 4096, "gpt-4o-mini": 16384, "gpt-4o": 4096}
+_DEFAULT_MAX_OUTPUT_TOKENS = 4096
+
+# Enum lookups by lower-cased value: unknown or oddly-cased labels from the model map to a
+# default instead of raising ValueError and discarding the whole section
+_SENTIMENT_MAP = {e.value.lower(): e for e in SentimentType}
+_URGENCY_MAP = {e.value.lower(): e for e in UrgencyLevel}
+_EMOTION_MAP = {e.value.lower(): e for e in EmotionType}
+
+
+def _cached_analysis(cache_key: str) -> Optional[Dict[str, Any]]:
+    """A deep copy of a cached analysis, so callers can't mutate the cached lists and models"""
+    cached = analysis_cache.get(cache_key)
+    return None if cached is None else copy.deepcopy(cached)
+
+
+def _cache_analysis(cache_key: str, analysis: Dict[str, Any]) -> None:
+    """Cache a deep copy of an analysis that is also being returned to a caller"""
+    analysis_cache.set(cache_key, copy.deepcopy(analysis))
+
+
+def _lookup(mapping: Dict[str, Any], value: Any, default: Any) -> Any:
+    return mapping.get(value.lower(), default) if isinstance(value, str) else default
+
+
+def _number(value: Any, default: float) -> float:
+    """A finite number from the model's output (45, "45.5" or "45%"), else `default`"""
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return number if math.isfinite(number) else default
+
+
+# Loaded tiktoken encodings by model. Only successful loads are kept; failures are retried
+# after _ENCODER_RETRY_SECONDS, so a transient download error doesn't disable counting for good
+_ENCODERS: Dict[str, Any] = {}
+_ENCODER_FAILED_AT: Dict[str, float] = {}
+
+
+def _load_token_encoder(model: str) -> None:
+    """Load the tiktoken encoding for a model. Blocking (may download the BPE file) - run it in a thread"""
+    if model in _ENCODERS:
+        return
+    failed_at = _ENCODER_FAILED_AT.get(model)
+    if failed_at is not None and time.monotonic() - failed_at < _ENCODER_RETRY_SECONDS:
+        return
+    try:
+        import tiktoken
+
+        try:
+            encoder = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoder = tiktoken.get_encoding("cl100k_base")
+    except Exception as exc:
+        _ENCODER_FAILED_AT[model] = time.monotonic()
+        logger.warning("tiktoken unavailable, estimating transcription length from characters: %s", exc)
+        return
+    _ENCODERS[model] = encoder
+    _ENCODER_FAILED_AT.pop(model, None)
+
+
+async def _ensure_token_encoder(model: str) -> None:
+    """Load a model's encoding off the event loop if it isn't loaded yet"""
+    if model not in _ENCODERS:
+        await asyncio.to_thread(_load_token_encoder, model)
+
+
+def _token_encoder(model: str):
+    """The loaded tiktoken encoding for a model, or None (never blocks - see _ensure_token_encoder)"""
+    return _ENCODERS.get(model)
+
+
+class _NoopCounter:
+    """Stand-in for a prometheus_client Counter when the package isn't installed"""
+
+    def labels(self, **labels: str) -> "_NoopCounter":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+
+@functools.lru_cache(maxsize=1)
+def _failure_counter():
+    """
+    Counter of analyses (or sections of one) that fell back to defaults, labelled by stage.
+    prometheus_client is optional: without it failures are only logged.
+    """
+    try:
+        from prometheus_client import Counter
+    except ImportError:
+        return _NoopCounter()
+    return Counter(
+        "sentiment_parse_failures_total",
+        "Call analyses or analysis sections that fell back to defaults",
+        ["stage"],
+    )
+
+
+def _record_failure(stage: str, message: str, *args: Any, **extra: Any) -> None:
+    """Log the exception being handled with structured context and count it under `stage`"""
+    logger.warning(message, *args, exc_info=True, extra={"stage": stage, **extra})
+    _failure_counter().labels(stage=stage).inc()
+
+
+# Connection pool shared by every request from the service's client
+OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# Errors worth retrying: 429s, 5xx and network failures (APITimeoutError is an APIConnectionError)
+_TRANSIENT_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+# Batch API statuses that mean the batch hasn't finished yet
+_BATCH_PENDING = ("validating", "in_progress", "finalizing", "cancelling")
+# Terminal states that may still carry an output file with the requests that finished
+_BATCH_DONE = ("completed", "expired", "cancelled")
+
+
+class _SectionScanner:
+    """
+    Incremental scanner over a streamed JSON object. feed() returns each top-level
+    (key, value) member as soon as its value is complete, without re-parsing the buffer.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self._text += chunk
+        text = self._text
+        members = []
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = orjson.loads(text[self._key_start : i + 1])
+                        self._key_start = None
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None and self._value_start is None:
+                    self._key_start = i
+            elif ch == ":" and self._depth == 1 and self._key is not None and self._value_start is None:
+                self._value_start = i + 1
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._value_start is not None:
+                    if self._depth == 1:
+                        # a nested object/array closed - the section is complete
+                        self._emit(members, text[self._value_start : i + 1])
+                    elif self._depth == 0:
+                        # a scalar was the last member
+                        self._emit(members, text[self._value_start : i])
+            elif ch == "," and self._depth == 1 and self._value_start is not None:
+                self._emit(members, text[self._value_start : i])
+        self._pos = len(text)
+        return members
+
+    def _emit(self, members: List[Tuple[str, Any]], raw: str) -> None:
+        try:
+            members.append((self._key, orjson.loads(raw)))
+        except orjson.JSONDecodeError:
+            _record_failure("stream_section", "Skipping malformed streamed section %r", self._key, section=self._key)
+        self._key = None
+        self._value_start = None
+
 
 class OpenAIAPIError(Exception):
     """Wrapper for OpenAI related errors when we want to signal failures explicitly."""
@@ -39,506 +403,598 @@ class AsyncSentimentAnalysisService:
     Features:
     - Lazy AsyncOpenAI client creation
     - Concurrency limiting via asyncio.Semaphore
-    - Retries with exponential backoff for transient errors (rate-limits / timeouts)
+    - Retries with jittered exponential backoff (tenacity) for rate limits, 5xx and network errors
     - Per-call timeouts
-    - Optional streaming hook
+    - Streaming variant that yields sections as they complete
     """
 
     def __init__(
         self,
         *,
         api_key: Optional[str] = None,
-        model: str = "gpt-3.5-turbo",
-        max_concurrent_requests: int = 8,
+        models: Optional[Dict[str, str]] = None,
+        max_concurrent_requests: Optional[int] = None,
         request_timeout: float = 20.0,
-        max_retries: int = 3,
-        initial_backoff: float = 0.5,
-        max_backoff: float = 8.0,
+        max_retries: int = 4,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 30.0,
     ):
         """
         Args:
             api_key: If None, will read from OPENAI_API_KEY env var lazily.
-            model: OpenAI model to use.
-            max_concurrent_requests: semaphore size to limit concurrency.
+            models: workload -> OpenAI model, over DEFAULT_MODELS and OPENAI_MODEL_<WORKLOAD>.
+            max_concurrent_requests: semaphore size to limit concurrency. Defaults to the
+                OPENAI_MAX_CONCURRENCY env var, or 8.
             request_timeout: timeout for each API call (seconds).
             max_retries: max retry attempts for transient errors.
             initial_backoff: base backoff in seconds.
             max_backoff: cap for backoff.
         """
-        self._client: Optional[AsyncOpenAI] = None
         self._api_key = api_key  # Will be loaded lazily if None
-        self.model = model
+        self.models = {
+            workload: os.getenv(f"OPENAI_MODEL_{workload.upper()}", model)
+            for workload, model in DEFAULT_MODELS.items()
+        }
+        self.models.update(models or {})
 
         # Controls
-        self.max_concurrent_requests = max_concurrent_requests
+        self.max_concurrent_requests = max_concurrent_requests or int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
         self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
         self.request_timeout = float(request_timeout)
         self.max_retries = int(max_retries)
         self.initial_backoff = float(initial_backoff)
         self.max_backoff = float(max_backoff)
 
-        # common system role messages per analysis type (keeps prompts DRY)
-        self._system_roles = {
-            "sentiment": "You are a sentiment analysis expert for call center quality auditing. Always respond with valid JSON only.",
-            "agent_behavior": "You are a call quality expert. Always respond with valid JSON only.",
-            "compliance": "You are a compliance risk expert. Always respond with valid JSON only.",
-            "questionnaire": "You are a call quality auditor. Score calls fairly based on the evidence in the transcription. Always respond with valid JSON only.",
-            "summary": "You are a call summarization expert. Be concise and factual.",
-            "intent": "You are a customer intent analysis expert. Always respond with valid JSON only.",
-        }
-
-    async def _ensure_client(self) -> AsyncOpenAI:
-        """Lazy init the AsyncOpenAI client."""
-        if self._client is None:
-            # Load API key lazily
-            api_key = self._api_key or os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                raise ValueError("OPENAI_API_KEY environment variable is not set.")
-            self._client = AsyncOpenAI(api_key=api_key)
-            logger.info("Initialized AsyncOpenAI client")
-        return self._client
-
-    async def _backoff_sleep(self, attempt: int) -> None:
-        """Exponential backoff with jitter."""
-        base = self.initial_backoff * (2 ** attempt)
-        wait = min(self.max_backoff, base)
-        # add small jitter
-        jitter = wait * 0.1 * (2 * (math.random() if hasattr(math, "random") else 0) - 1)
-        # To avoid dependency on random module for small jitter, use a deterministic small jitter fallback
-        # but ideally use random.random() if available. We'll use a safe no-jitter fallback if not available.
-        try:
-            import random
-
-            jitter = wait * 0.1 * (random.random() - 0.5)
-        except Exception:
-            jitter = 0.0
-        sleep_for = max(0.0, wait + jitter)
-        logger.debug("Backoff sleeping for %.2fs (attempt=%d)", sleep_for, attempt)
-        await asyncio.sleep(sleep_for)
-
-    async def _is_transient_error(self, exc: Exception) -> bool:
-        """Heuristic to identify transient (retryable) errors."""
-        # Common transient errors include network timeouts, rate limits, temporary connection issues.
-        # We don't import SDK-specific error classes to keep compatibility; inspect messages instead.
-        message = str(exc).lower()
-        if isinstance(exc, asyncio.TimeoutError):
-            return True
-        if "rate limit" in message or "too many requests" in message or "429" in message:
-            return True
-        if "connection" in message or "connection reset" in message or "timed out" in message:
-            return True
-        # Add other heuristics as needed
-        return False
+    @functools.cached_property
+    def client(self) -> AsyncOpenAI:
+        """
+        AsyncOpenAI client, built once on first use (so importing the module doesn't
+        need OPENAI_API_KEY) and then stored on the instance.
+        """
+        # Load API key lazily
+        api_key = self._api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is not set.")
+        logger.info("Initialized AsyncOpenAI client")
+        # _call_chat_completion owns retries and per-call timeouts; SDK retries on top
+        # would multiply attempts (and hold a semaphore slot) on every transient error.
+        # One explicit connection pool keeps TLS connections alive across analyses
+        return AsyncOpenAI(
+            api_key=api_key,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(limits=OPENAI_HTTP_LIMITS),
+        )
+
+    def warmup(self) -> None:
+        """
+        Load the tiktoken encodings for every configured model at startup, so the first
+        analysis doesn't wait on the BPE download. Safe to call more than once.
+        """
+        for model in set(self.models.values()):
+            _load_token_encoder(model)
+
+    def _retrying(self) -> AsyncRetrying:
+        """Retry policy for transient OpenAI errors: jittered exponential backoff, then re-raise"""
+        return AsyncRetrying(
+            wait=wait_random_exponential(multiplier=self.initial_backoff, max=self.max_backoff),
+            stop=stop_after_attempt(self.max_retries + 1),
+            retry=retry_if_exception_type(_TRANSIENT_ERRORS),
+            before_sleep=self._log_retry,
+            reraise=True,
+        )
+
+    def _log_retry(self, state: RetryCallState) -> None:
+        logger.warning(
+            "OpenAI call failed on attempt %d/%d: %s - retrying in %.2fs",
+            state.attempt_number,
+            self.max_retries + 1,
+            state.outcome.exception(),
+            state.next_action.sleep,
+        )
 
     async def _call_chat_completion(
         self,
         messages: List[Dict[str, str]],
         *,
+        model: str,
         timeout: Optional[float] = None,
-        stream: bool = False,
-        stream_callback: Optional[Callable[[str], Coroutine[Any, Any, None]]] = None,
         temperature: float = 0.3,
         max_tokens: Optional[int] = None,
+        response_format: Optional[Dict[str, str]] = None,
     ) -> Any:
         """
         Centralized call wrapper to OpenAI chat completions with retries, timeout and concurrency limits.
-
-        If stream=True, the OpenAI SDK may return a streaming response; our wrapper supports a simple callback.
+        Streaming requests go through analyze_call_stream instead.
         """
-        client = await self._ensure_client()
-        attempt = 0
-        timeout = timeout or self.request_timeout
-
-        while attempt <= self.max_retries:
-            attempt += 1
-            try:
-                async with self._semaphore:
-                    coro = client.chat.completions.create(
-                        model=self.model,
-                        messages=messages,
-                        temperature=temperature,
-                        max_tokens=max_tokens,
-                        stream=stream,
-                    )
-                    # enforce per-call timeout
-                    response = await asyncio.wait_for(coro, timeout=timeout)
-
-                    # If streaming with callback: SDK behavior varies; here we assume SDK yields a stream object
-                    # that is already handled by the SDK. If you need to handle streamed chunks manually, adapt here.
-                    return response
-            except Exception as exc:
-                # classify transient errors to retry
-                transient = await self._is_transient_error(exc)
-                logger.warning(
-                    "OpenAI call failed on attempt %d/%d: %s (transient=%s)",
-                    attempt,
-                    self.max_retries,
-                    exc,
-                    transient,
-                )
-                if attempt > self.max_retries or not transient:
-                    logger.exception("Max retries reached or not transient—raising OpenAIAPIError")
-                    raise OpenAIAPIError(f"OpenAI call failed: {exc}") from exc
-                # backoff with jitter
-                backoff_seconds = min(self.max_backoff, self.initial_backoff * (2 ** (attempt - 1)))
-                # add small jitter using random
-                try:
-                    import random
-
-                    jitter = random.uniform(-0.1 * backoff_seconds, 0.1 * backoff_seconds)
-                except Exception:
-                    jitter = 0.0
-                sleep_for = max(0.0, backoff_seconds + jitter)
-                logger.info("Retrying after %.2fs", sleep_for)
-                await asyncio.sleep(sleep_for)
-
-    # ---------------------
-    # Internal helpers
-    # ---------------------
-    def _safe_json_loads(self, text: str) -> Any:
-        """Try to parse JSON robustly; if invalid, attempt to extract JSON substring, else raise."""
-        if not text or text.strip() == "":
-            raise ValueError("Empty response content")
-        
-        text = text.strip()
-        
-        # Remove markdown code blocks if present
-        if text.startswith("```"):
-            lines = text.split("\n")
-            text = "\n".join(lines[1:-1] if lines[-1].strip() == "```" else lines[1:])
-            text = text.strip()
-        
+        client = self.client
+        extra = {"response_format": response_format} if response_format else {}
         try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            # Try to find JSON object {...}
-            obj_start = text.find("{")
-            obj_end = text.rfind("}")
-            
-            # Try to find JSON array [...]
-            arr_start = text.find("[")
-            arr_end = text.rfind("]")
-            
-            # Determine which comes first and is valid
-            candidates = []
-            if obj_start != -1 and obj_end != -1 and obj_end > obj_start:
-                candidates.append((obj_start, obj_end, "{"))
-            if arr_start != -1 and arr_end != -1 and arr_end > arr_start:
-                candidates.append((arr_start, arr_end, "["))
-            
-            # Sort by start position and try each
-            for start, end, _ in sorted(candidates, key=lambda x: x[0]):
-                substring = text[start : end + 1]
-                try:
-                    return json.loads(substring)
-                except json.JSONDecodeError:
-                    continue
-            
-            logger.debug("Failed parsing JSON from response: %s", text[:200])
-            raise
+            async for attempt in self._retrying():
+                with attempt:
+                    # Each attempt takes its own semaphore slot, so backoff sleeps don't hold one
+                    async with self._semaphore:
+                        return await client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            timeout=timeout or self.request_timeout,
+                            **extra,
+                        )
+        except Exception as exc:
+            raise OpenAIAPIError(f"OpenAI call failed: {exc}") from exc
 
     # ---------------------
     # Public analysis methods
     # ---------------------
     async def analyze_call(self, transcription: str) -> Dict[str, Any]:
         """
-        Main entrypoint — runs multiple analyses in parallel where safe and returns combined result.
+        Main entrypoint — analyzes the call with a single JSON-mode completion and returns the combined result.
         """
         if not transcription:
             raise ValueError("transcription must be provided")
-
-        # Run analysis parts concurrently to save wall-clock time (limited by semaphore)
-        # We'll run sentiment, agent behavior, compliance, intent and summary concurrently.
-        tasks = [
-            asyncio.create_task(self._analyze_sentiment(transcription)),
-            asyncio.create_task(self._analyze_agent_behavior(transcription)),
-            asyncio.create_task(self._assess_compliance_risk(transcription)),
-            asyncio.create_task(self._analyze_intent(transcription)),
-            asyncio.create_task(self._generate_summary(transcription)),
-            asyncio.create_task(self._score_questionnaire(transcription)),
-        ]
-
-        # Gather all results and handle exceptions per-task
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Unpack results carefully and handle exceptions gracefully
-        sentiment_result = results[0] if not isinstance(results[0], Exception) else None
-        agent_behavior = results[1] if not isinstance(results[1], Exception) else None
-        compliance_risk = results[2] if not isinstance(results[2], Exception) else None
-        intent_analysis = results[3] if not isinstance(results[3], Exception) else {
-            "intent": "Unknown",
-            "issues": [],
-            "resolution_status": "Unknown",
-            "follow_up_required": False,
-        }
-        call_summary = results[4] if not isinstance(results[4], Exception) else "Summary unavailable"
-        question_scores = results[5] if not isinstance(results[5], Exception) else []
-
-        # Compose final payload (maintaining the same keys as your original service)
-        return {
-            "customer_sentiment": sentiment_result,
-            "agent_behavior": agent_behavior,
-            "compliance_risk": compliance_risk,
-            "question_scores": question_scores,
-            "call_summary": call_summary,
-            "customer_intent": intent_analysis.get("intent"),
-            "key_issues": intent_analysis.get("issues"),
-            "resolution_status": intent_analysis.get("resolution_status"),
-            "follow_up_required": intent_analysis.get("follow_up_required"),
-        }
-
-    # ---------------------
-    # Individual analysis implementations
-    # ---------------------
-    def _get_questionnaire(self) -> List[Dict[str, Any]]:
-        """Questionnaire kept as a pure function so it can be reused/tested easily."""
-        return [
-            # Call Opening
-            {"category": "Call Opening", "question": "Did agent probe customer name before continuing?", "max_score": 3},
-            {"category": "Call Opening", "question": "Did agent open call as per timelines and script?", "max_score": 3},
-            {"category": "Call Opening", "question": "Did agent give opening within 5 seconds?", "max_score": 2},
-            {"category": "Call Opening", "question": "Did agent greet according to language selection?", "max_score": 2},
-            # Soft Skills
-            {"category": "Soft Skills", "question": "Did agent willingly help without making commitments?", "max_score": 3},
-            {"category": "Soft Skills", "question": "Did agent use proper sentence structure and grammar?", "max_score": 3},
-            {"category": "Soft Skills", "question": "Was agent confident during the call?", "max_score": 3},
-            {"category": "Soft Skills", "question": "Did agent show empathy towards customer?", "max_score": 4},
-            {"category": "Soft Skills", "question": "Did agent maintain professional tone throughout?", "max_score": 3},
-            # Probing & Understanding
-            {"category": "Probing & Understanding", "question": "Did agent ask effective questions to understand needs?", "max_score": 4},
-            {"category": "Probing & Understanding", "question": "Did agent understand customer concern at first instance?", "max_score": 3},
-            {"category": "Probing & Understanding", "question": "Did agent ask pertinent diagnostic questions?", "max_score": 3},
-            # Problem Resolution
-            {"category": "Problem Resolution", "question": "Did agent provide accurate information?", "max_score": 5},
-            {"category": "Problem Resolution", "question": "Did agent offer appropriate solutions?", "max_score": 5},
-            {"category": "Problem Resolution", "question": "Did agent handle objections effectively?", "max_score": 4},
-            # Call Closing
-            {"category": "Call Closing", "question": "Did agent follow correct closing format?", "max_score": 3},
-            {"category": "Call Closing", "question": "Did agent summarize the call properly?", "max_score": 3},
-            {"category": "Call Closing", "question": "Did agent ask for further assistance?", "max_score": 2},
-            # Critical Parameters
-            {"category": "Critical Parameters", "question": "Did agent NOT disconnect without warning?", "max_score": 10},
-            {"category": "Critical Parameters", "question": "Did agent use correct categorization?", "max_score": 5},
-        ]
-
-    async def _analyze_sentiment(self, transcription: str) -> CustomerSentiment:
-        prompt = f"""Analyze the customer sentiment from this call transcription and return a JSON object with these exact fields:
-- overall_sentiment: one of "Positive", "Neutral", "Negative", "Mixed"
-- emotions: array of emotions detected, each one of: "Calm", "Cooperative", "Confused", "Angry", "Frustrated", "Satisfied"
-- urgency_level: one of "High", "Medium", "Low"
-- frustration_indicator: boolean
-- escalation_risk: number between 0-100 representing percentage
-- call_opening_emotion: one of "Calm", "Cooperative", "Confused", "Angry", "Frustrated", "Satisfied"
-- call_end_emotion: one of "Calm", "Cooperative", "Confused", "Angry", "Frustrated", "Satisfied"
-
-Transcription: {transcription}
-
-Return ONLY valid JSON, no other text.
-"""
-        messages = [
-            {"role": "system", "content": self._system_roles["sentiment"]},
-            {"role": "user", "content": prompt},
-        ]
-
+        return await self._analyze_one(transcription, self.models["realtime"])
+
+    async def _analyze_one(self, transcription: str, model: str) -> Dict[str, Any]:
+        cache_key = self._cache_key(transcription, model)
+        cached = _cached_analysis(cache_key)
+        if cached is not None:
+            logger.info("Call analysis served from cache")
+            return cached
+
+        await _ensure_token_encoder(model)
+        # One request for every section instead of six: the transcription is sent (and billed)
+        # once, and JSON mode guarantees a parseable object without markdown fences
         try:
-            resp = await self._call_chat_completion(messages, timeout=self.request_timeout)
-            # Access returned text (SDK may vary in attribute names; adjust if needed)
-            content = getattr(resp.choices[0].message, "content", None) or getattr(resp.choices[0].message, "content", None) or str(resp)
-            # If content is an object with 'content' under choices[0].message['content'] depending on SDK representation:
-            if isinstance(content, dict) and "content" in content:
-                content = content["content"]
-            parsed = self._safe_json_loads(content)
-            return CustomerSentiment(
-                overall_sentiment=SentimentType(parsed.get("overall_sentiment", "Neutral")),
-                emotions=[EmotionType(e) for e in parsed.get("emotions", ["Calm"])],
-                urgency_level=UrgencyLevel(parsed.get("urgency_level", "Medium")),
-                frustration_indicator=bool(parsed.get("frustration_indicator", False)),
-                escalation_risk=int(parsed.get("escalation_risk", 0)),
-                call_opening_emotion=EmotionType(parsed.get("call_opening_emotion", "Calm")),
-                call_end_emotion=EmotionType(parsed.get("call_end_emotion", "Calm")),
+            resp = await self._call_chat_completion(
+                self._analysis_messages(transcription, model),
+                model=model,
+                timeout=60.0,
+                max_tokens=ANALYSIS_MAX_TOKENS,
+                response_format=JSON_RESPONSE_FORMAT,
             )
-        except Exception as exc:
-            logger.exception("Sentiment analysis failed, returning defaults: %s", exc)
-            return CustomerSentiment(
-                overall_sentiment=SentimentType.NEUTRAL,
-                emotions=[EmotionType.CALM],
-                urgency_level=UrgencyLevel.MEDIUM,
-                frustration_indicator=False,
-                escalation_risk=0,
-                call_opening_emotion=EmotionType.CALM,
-                call_end_emotion=EmotionType.CALM,
+            parsed = self._parse_content(getattr(resp.choices[0].message, "content", None) or "")
+        except Exception:
+            _record_failure(
+                "analyze_call",
+                "Call analysis failed - returning defaults",
+                model=model,
+                transcription_len=len(transcription),
             )
+            # Not cached, so the next attempt at this transcription calls the API again
+            return self._default_analysis()
 
-    async def _analyze_agent_behavior(self, transcription: str) -> AgentBehavior:
-        prompt = f"""Analyze the agent's behavior in this call transcription and return a JSON object with these exact boolean fields:
-- calmness: was the agent calm throughout?
-- confidence: did the agent sound confident?
-- politeness: was the agent polite?
-- empathy: did the agent show empathy?
-- proper_grammar: did the agent use proper grammar?
+        analysis = self._build_analysis(parsed)
+        _cache_analysis(cache_key, analysis)
+        return analysis
 
-Transcription: {transcription}
+    async def analyze_call_stream(self, transcription: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of analyze_call for consumers that can show partial results (e.g. SSE).
 
-Return ONLY valid JSON, no other text.
-"""
-        messages = [
-            {"role": "system", "content": self._system_roles["agent_behavior"]},
-            {"role": "user", "content": prompt},
-        ]
+        Yields (section, value) for each top-level section of the model's JSON (e.g.
+        "customer_sentiment" as a dict) the moment it has been written, then a final
+        ("analysis", payload) with the complete result in the same shape as analyze_call.
+        A stream cut short still ends with a payload, using defaults for missing sections.
+        A cached analysis is yielded straight away as the final payload.
+        """
+        if not transcription:
+            raise ValueError("transcription must be provided")
+
+        model = self.models["realtime"]
+        cache_key = self._cache_key(transcription, model)
+        cached = _cached_analysis(cache_key)
+        if cached is not None:
+            yield "analysis", cached
+            return
+
+        await _ensure_token_encoder(model)
+        client = self.client
+        scanner = _SectionScanner()
+        parsed: Dict[str, Any] = {}
+        complete = False
+        stream = None
         try:
-            resp = await self._call_chat_completion(messages, timeout=self.request_timeout)
-            content = getattr(resp.choices[0].message, "content", None) or str(resp)
-            parsed = self._safe_json_loads(content)
-            return AgentBehavior(
-                calmness=bool(parsed.get("calmness", True)),
-                confidence=bool(parsed.get("confidence", True)),
-                politeness=bool(parsed.get("politeness", True)),
-                empathy=bool(parsed.get("empathy", True)),
-                proper_grammar=bool(parsed.get("proper_grammar", True)),
-            )
+            # Only opening the stream is retried - once sections have been yielded it can't restart.
+            # The semaphore is held per attempt, so neither backoff sleeps nor a slow consumer hold a slot
+            async for attempt in self._retrying():
+                with attempt:
+                    async with self._semaphore:
+                        stream = await client.chat.completions.create(
+                            model=model,
+                            messages=self._analysis_messages(transcription, model),
+                            temperature=0.3,
+                            max_tokens=ANALYSIS_MAX_TOKENS,
+                            response_format=JSON_RESPONSE_FORMAT,
+                            stream=True,
+                            timeout=self.request_timeout,
+                        )
+            chunks = stream.__aiter__()
+            while True:
+                # The deadline covers waiting on the API for each chunk, not the time spent in our yields
+                try:
+                    async with asyncio.timeout(self.request_timeout):
+                        chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta.content:
+                    for key, value in scanner.feed(choice.delta.content):
+                        parsed[key] = value
+                        yield key, value
+                if choice.finish_reason is not None:
+                    complete = choice.finish_reason == "stop"
         except Exception:
-            logger.exception("Agent behavior analysis failed")
-            return AgentBehavior(
-                calmness=True, confidence=True, politeness=True, empathy=True, proper_grammar=True
+            _record_failure(
+                "stream",
+                "Streaming call analysis failed - filling missing sections with defaults",
+                model=model,
+                transcription_len=len(transcription),
+                sections_received=len(parsed),
             )
+        finally:
+            if stream is not None:
+                # Release the HTTP connection even when the consumer stops iterating early
+                await stream.close()
 
-    async def _assess_compliance_risk(self, transcription: str) -> ComplianceRisk:
-        prompt = f"""Assess the compliance risk in this call transcription and return a JSON object with:
-- fraud_suspected: boolean indicating if fraud is suspected
-- compliance_risk: one of "low", "medium", "high"
-- trust_justification: brief explanation of the risk assessment
+        analysis = self._build_analysis(parsed)
+        if complete:
+            _cache_analysis(cache_key, analysis)
+        yield "analysis", analysis
 
-Transcription: {transcription}
+    async def analyze_calls(self, transcriptions: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze many calls at once, packing short transcriptions into shared requests so the
+        system prompt and questionnaire are sent once per pack rather than once per call.
 
-Return ONLY valid JSON, no other text.
-"""
-        messages = [
-            {"role": "system", "content": self._system_roles["compliance"]},
-            {"role": "user", "content": prompt},
-        ]
+        Args:
+            transcriptions: mapping of call_id -> transcription.
+
+        Returns:
+            A mapping of call_id -> analysis (same shape as analyze_call). Calls too long to
+            share a request, or missing from a packed response, get a request of their own.
+        """
+        if not transcriptions:
+            raise ValueError("transcriptions must be provided")
+
+        model = self.models["packed"]
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[str, str] = {}
+        for call_id, transcription in transcriptions.items():
+            if not transcription:
+                results[call_id] = self._default_analysis()
+                continue
+            cached = _cached_analysis(self._cache_key(transcription, model))
+            if cached is not None:
+                results[call_id] = cached
+            else:
+                pending[call_id] = transcription
+
+        await _ensure_token_encoder(model)
+        packs = self._pack_transcriptions(pending, model)
+        for analyses in await asyncio.gather(*(self._analyze_pack(pack, model) for pack in packs)):
+            results.update(analyses)
+        return {call_id: results[call_id] for call_id in transcriptions}
+
+    def _pack_transcriptions(self, transcriptions: Dict[str, str], model: str) -> List[Dict[str, str]]:
+        """Greedily group calls, in order, into packs that fit the packed input and output limits"""
+        available = PACKED_INPUT_TOKEN_BUDGET - self._count_tokens(_PACKED_SYSTEM_PROMPT, model)
+        calls_limit = _MAX_OUTPUT_TOKENS.get(model, _DEFAULT_MAX_OUTPUT_TOKENS) // ANALYSIS_MAX_TOKENS
+        packs: List[Dict[str, str]] = []
+        current: Dict[str, str] = {}
+        used = 0
+        for call_id, transcription in transcriptions.items():
+            tokens = self._count_tokens(_PACKED_CALL_BLOCK.format(call_id=call_id, transcription=transcription), model)
+            if tokens > available:
+                # Too long to share a request - a request of its own trims it to the single-call budget
+                packs.append({call_id: transcription})
+                continue
+            if current and (used + tokens > available or len(current) >= calls_limit):
+                packs.append(current)
+                current, used = {}, 0
+            current[call_id] = transcription
+            used += tokens
+        if current:
+            packs.append(current)
+        return packs
+
+    async def _analyze_pack(self, pack: Dict[str, str], model: str) -> Dict[str, Dict[str, Any]]:
+        """One request for every call in the pack; calls it doesn't answer are analyzed individually"""
+        if len(pack) == 1:
+            (call_id, transcription), = pack.items()
+            return {call_id: await self._analyze_one(transcription, model)}
+
+        prompt = "".join(
+            _PACKED_CALL_BLOCK.format(call_id=call_id, transcription=transcription)
+            for call_id, transcription in pack.items()
+        )
         try:
-            resp = await self._call_chat_completion(messages, timeout=self.request_timeout)
-            content = getattr(resp.choices[0].message, "content", None) or str(resp)
-            parsed = self._safe_json_loads(content)
-            return ComplianceRisk(
-                fraud_suspected=bool(parsed.get("fraud_suspected", False)),
-                compliance_risk=str(parsed.get("compliance_risk", "low")),
-                trust_justification=str(parsed.get("trust_justification", "No concerns identified")),
+            resp = await self._call_chat_completion(
+                [{"role": "system", "content": _PACKED_SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+                model=model,
+                timeout=60.0 * len(pack),
+                max_tokens=ANALYSIS_MAX_TOKENS * len(pack),
+                response_format=JSON_RESPONSE_FORMAT,
             )
+            parsed = self._parse_content(getattr(resp.choices[0].message, "content", None) or "")
         except Exception:
-            logger.exception("Compliance risk assessment failed")
-            return ComplianceRisk(fraud_suspected=False, compliance_risk="low", trust_justification="Unable to assess")
+            _record_failure(
+                "packed",
+                "Packed analysis of %d calls failed - analyzing them one by one",
+                len(pack),
+                model=model,
+                calls=len(pack),
+            )
+            parsed = {}
+
+        results: Dict[str, Dict[str, Any]] = {}
+        retry: Dict[str, str] = {}
+        for call_id, transcription in pack.items():
+            section = parsed.get(call_id)
+            if isinstance(section, dict) and section:
+                analysis = self._build_analysis(section)
+                _cache_analysis(self._cache_key(transcription, model), analysis)
+                results[call_id] = analysis
+            else:
+                retry[call_id] = transcription
+
+        if retry:
+            analyses = await asyncio.gather(*(self._analyze_one(t, model) for t in retry.values()))
+            results.update(zip(retry, analyses))
+        return results
+
+    @staticmethod
+    def _count_tokens(text: str, model: str) -> int:
+        encoder = _token_encoder(model)
+        if encoder is None:
+            return len(text) // _CHARS_PER_TOKEN + 1
+        return len(encoder.encode(text))
+
+    def _analysis_messages(self, transcription: str, model: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": self._fit_transcription(transcription, model)},
+        ]
 
-    async def _score_questionnaire(self, transcription: str) -> List[QuestionScore]:
-        questionnaire = self._get_questionnaire()
-        questions_text = "\n".join([f"{i+1}. [{q['category']}] {q['question']} (max: {q['max_score']} points)" for i, q in enumerate(questionnaire)])
-        prompt = f"""Score this call against each question. For each question, provide:
-- score: points earned (0 to max_score)
-- answer: brief explanation (Yes/No/NA with reason)
+    @staticmethod
+    def _fit_transcription(transcription: str, model: str) -> str:
+        """Keep the head and tail of a transcription that exceeds TRANSCRIPTION_TOKEN_BUDGET"""
+        encoder = _token_encoder(model)
+        if encoder is None:
+            if len(transcription) <= TRANSCRIPTION_TOKEN_BUDGET * _CHARS_PER_TOKEN:
+                return transcription
+            head = transcription[: _TRANSCRIPTION_HEAD_TOKENS * _CHARS_PER_TOKEN]
+            tail = transcription[-_TRANSCRIPTION_TAIL_TOKENS * _CHARS_PER_TOKEN :]
+        else:
+            tokens = encoder.encode(transcription)
+            if len(tokens) <= TRANSCRIPTION_TOKEN_BUDGET:
+                return transcription
+            head = encoder.decode(tokens[:_TRANSCRIPTION_HEAD_TOKENS])
+            tail = encoder.decode(tokens[-_TRANSCRIPTION_TAIL_TOKENS:])
+        logger.info("Transcription over %d tokens - keeping its opening and closing", TRANSCRIPTION_TOKEN_BUDGET)
+        return head + _TRUNCATION_MARKER + tail
+
+    @staticmethod
+    def _parse_content(content: str) -> Dict[str, Any]:
+        """Load the model's JSON. Every request uses JSON mode, so there are no fences or prose to strip"""
+        parsed = orjson.loads(content)
+        if not isinstance(parsed, dict):
+            raise ValueError(f"Expected a JSON object, got {type(parsed).__name__}")
+        return parsed
+
+    @staticmethod
+    def _cache_key(transcription: str, model: str) -> str:
+        key = json.dumps({"m": model, "t": transcription, "v": PROMPT_VERSION}, sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _build_analysis(self, parsed: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn the model's JSON into the analysis payload; each section falls back to defaults on its own"""
+        sections = (
+            ("customer_sentiment", self._parse_sentiment),
+            ("agent_behavior", self._parse_agent_behavior),
+            ("compliance_risk", self._parse_compliance_risk),
+            ("question_scores", self._parse_question_scores),
+        )
+        analysis = self._default_analysis()
+        for key, parse in sections:
+            if not parsed.get(key):
+                continue
+            try:
+                analysis[key] = parse(parsed[key])
+            except Exception:
+                _record_failure(key, "Could not parse %s - returning defaults", key, section=key)
+
+        analysis["call_summary"] = str(parsed.get("call_summary") or "Summary not available.").strip()
+        issues = parsed.get("key_issues", [])
+        analysis["customer_intent"] = str(parsed.get("customer_intent", "Unknown"))
+        analysis["key_issues"] = [str(i) for i in issues] if isinstance(issues, list) else []
+        analysis["resolution_status"] = str(parsed.get("resolution_status", "Unknown"))
+        analysis["follow_up_required"] = bool(parsed.get("follow_up_required", False))
+        return analysis
 
-Questions:
-{questions_text}
+    # ---------------------
+    # Batch API (offline / re-audit workloads)
+    # ---------------------
+    async def submit_analysis_batch(self, transcriptions: Dict[str, str]) -> str:
+        """
+        Queue analyses on the OpenAI Batch API: half the token price and a separate
+        rate-limit pool, with results within 24h. Suited to bulk re-audits and reports,
+        not to uploads waiting on a result (use analyze_call for those).
 
-Transcription: {transcription}
+        Args:
+            transcriptions: mapping of call_id -> transcription.
 
-Return a JSON array with objects containing: category, question, answer, score, max_score
-Return ONLY valid JSON array, no other text.
-"""
-        messages = [
-            {"role": "system", "content": self._system_roles["questionnaire"]},
-            {"role": "user", "content": prompt},
+        Returns:
+            The batch id to pass to collect_analysis_batch.
+        """
+        if not transcriptions:
+            raise ValueError("transcriptions must be provided")
+
+        client = self.client
+        model = self.models["batch"]
+        await _ensure_token_encoder(model)
+        lines = [
+            json.dumps({
+                "custom_id": call_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": self._analysis_messages(transcription, model),
+                    "temperature": 0.3,
+                    "max_tokens": ANALYSIS_MAX_TOKENS,
+                    "response_format": JSON_RESPONSE_FORMAT,
+                },
+            })
+            for call_id, transcription in transcriptions.items()
         ]
-        try:
-            # Questionnaire needs more tokens (20 questions with detailed responses)
-            resp = await self._call_chat_completion(messages, timeout=30.0, max_tokens=2500)
-            content = getattr(resp.choices[0].message, "content", None) or ""
-            
-            # Log if content seems problematic
-            if not content or len(content) < 10:
-                logger.warning("Questionnaire got short/empty response: %s", repr(content))
-            results = self._safe_json_loads(content)
-            output = []
-            for r in results:
-                try:
-                    score = int(r.get("score", 0))
-                    max_score = int(r.get("max_score", 5))
-                except Exception:
-                    score = 0
-                    max_score = r.get("max_score", 5) if isinstance(r.get("max_score", None), int) else 5
-                output.append(
-                    QuestionScore(
-                        category=r.get("category", "Unknown"),
-                        question=r.get("question", ""),
-                        answer=r.get("answer", "NA"),
-                        score=min(score, max_score),
-                        max_score=max_score,
-                    )
-                )
-            return output
-        except Exception:
-            logger.exception("Questionnaire scoring failed - returning defaults")
-            return [
-                QuestionScore(
-                    category=q["category"],
-                    question=q["question"],
-                    answer="Unable to assess",
-                    score=0,
-                    max_score=q["max_score"],
-                )
-                for q in questionnaire
-            ]
-
-    async def _generate_summary(self, transcription: str) -> str:
-        prompt = f"""Provide a brief 2-3 sentence summary of this customer service call:
-
-{transcription}
+        batch_file = await client.files.create(
+            file=("call_analyses.jsonl", "\n".join(lines).encode()),
+            purpose="batch",
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info("Submitted analysis batch %s with %d calls", batch.id, len(lines))
+        return batch.id
+
+    async def collect_analysis_batch(self, batch_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Fetch the results of a batch from submit_analysis_batch.
 
-Focus on: the customer's issue, what action was taken, and the outcome.
-"""
-        messages = [
-            {"role": "system", "content": self._system_roles["summary"]},
-            {"role": "user", "content": prompt},
-        ]
-        try:
-            resp = await self._call_chat_completion(messages, timeout=self.request_timeout)
-            # SDK response object shape may vary; support common access patterns
-            content = getattr(resp.choices[0].message, "content", None) or str(resp)
-            # If content is dict with 'content' key:
-            if isinstance(content, dict) and "content" in content:
-                return content["content"].strip()
-            return str(content).strip()
-        except Exception:
-            logger.exception("Summary generation failed")
-            return "Summary not available."
+        Returns:
+            None while the batch is still running, else a mapping of call_id -> analysis
+            (same shape as analyze_call). An expired or cancelled batch returns whatever it
+            finished; requests that failed or never ran are omitted.
+        """
+        client = self.client
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status in _BATCH_PENDING:
+            return None
+        if batch.status not in _BATCH_DONE or not batch.output_file_id:
+            raise OpenAIAPIError(f"Analysis batch {batch_id} ended with status {batch.status} without any output")
+        if batch.status != "completed":
+            logger.warning("Analysis batch %s %s - collecting its partial output", batch_id, batch.status)
+
+        output = await client.files.content(batch.output_file_id)
+        results: Dict[str, Dict[str, Any]] = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            call_id = None
+            try:
+                item = orjson.loads(line)
+                call_id = item["custom_id"]
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    raise OpenAIAPIError(f"request failed: {item.get('error') or response.get('status_code')}")
+                body = response["body"]
+                parsed = self._parse_content(body["choices"][0]["message"]["content"] or "")
+            except Exception:
+                _record_failure(
+                    "batch",
+                    "Batch result for call %s is unusable - omitting it",
+                    call_id,
+                    batch_id=batch_id,
+                    call_id=call_id,
+                )
+                continue
+            results[call_id] = self._build_analysis(parsed)
+        return results
 
-    async def _analyze_intent(self, transcription: str) -> Dict[str, Any]:
-        prompt = f"""Analyze this call and return a JSON object with:
-- intent: customer's primary intent (e.g., "Complaint", "Query", "Feedback", "Request")
-- issues: array of specific issues raised
-- resolution_status: one of "Resolved", "Partially Resolved", "Unresolved", "Requires Follow-up"
-- follow_up_required: boolean
+    async def analyze_calls_batch(
+        self,
+        transcriptions: Dict[str, str],
+        *,
+        poll_interval: float = 30.0,
+        max_poll_interval: float = 600.0,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Submit a batch and wait for it, polling with exponential backoff. Runs for as long
+        as the batch does (up to 24h), so call it from a worker or script, not a request.
+        Calls without a usable result are omitted, so they can be retried with analyze_calls.
+        """
+        batch_id = await self.submit_analysis_batch(transcriptions)
+        delay = poll_interval
+        while True:
+            results = await self.collect_analysis_batch(batch_id)
+            if results is not None:
+                return results
+            await asyncio.sleep(delay)
+            delay = min(max_poll_interval, delay * 2)
 
-Transcription: {transcription}
+    # ---------------------
+    # Fallback results
+    # ---------------------
+    @staticmethod
+    def _default_analysis() -> Dict[str, Any]:
+        """The analysis of a call with no usable model output; only the mutable lists are copied"""
+        return {**_DEFAULT_ANALYSIS, "question_scores": list(_DEFAULT_QUESTION_SCORES), "key_issues": []}
 
-Return ONLY valid JSON, no other text.
-"""
-        messages = [
-            {"role": "system", "content": self._system_roles["intent"]},
-            {"role": "user", "content": prompt},
-        ]
-        try:
-            resp = await self._call_chat_completion(messages, timeout=self.request_timeout)
-            content = getattr(resp.choices[0].message, "content", None) or str(resp)
-            parsed = self._safe_json_loads(content)
-            return {
-                "intent": parsed.get("intent", "Unknown"),
-                "issues": parsed.get("issues", []),
-                "resolution_status": parsed.get("resolution_status", "Unknown"),
-                "follow_up_required": bool(parsed.get("follow_up_required", False)),
-            }
-        except Exception:
-            logger.exception("Intent analysis failed")
-            return {"intent": "Unknown", "issues": [], "resolution_status": "Unknown", "follow_up_required": False}
+    # ---------------------
+    # Section parsers
+    # ---------------------
+    @staticmethod
+    def _parse_sentiment(parsed: Dict[str, Any]) -> CustomerSentiment:
+        emotions = parsed.get("emotions")
+        if not isinstance(emotions, list):
+            emotions = []
+        return CustomerSentiment(
+            overall_sentiment=_lookup(_SENTIMENT_MAP, parsed.get("overall_sentiment"), SentimentType.NEUTRAL),
+            emotions=[_EMOTION_MAP[e.lower()] for e in emotions if isinstance(e, str) and e.lower() in _EMOTION_MAP]
+            or [EmotionType.CALM],
+            urgency_level=_lookup(_URGENCY_MAP, parsed.get("urgency_level"), UrgencyLevel.MEDIUM),
+            frustration_indicator=bool(parsed.get("frustration_indicator", False)),
+            escalation_risk=max(0.0, min(_number(parsed.get("escalation_risk"), 0.0), 100.0)),
+            call_opening_emotion=_lookup(_EMOTION_MAP, parsed.get("call_opening_emotion"), EmotionType.CALM),
+            call_end_emotion=_lookup(_EMOTION_MAP, parsed.get("call_end_emotion"), EmotionType.CALM),
+        )
+
+    @staticmethod
+    def _parse_agent_behavior(parsed: Dict[str, Any]) -> AgentBehavior:
+        return AgentBehavior(
+            calmness=bool(parsed.get("calmness", True)),
+            confidence=bool(parsed.get("confidence", True)),
+            politeness=bool(parsed.get("politeness", True)),
+            empathy=bool(parsed.get("empathy", True)),
+            proper_grammar=bool(parsed.get("proper_grammar", True)),
+        )
+
+    @staticmethod
+    def _parse_compliance_risk(parsed: Dict[str, Any]) -> ComplianceRisk:
+        return ComplianceRisk(
+            fraud_suspected=bool(parsed.get("fraud_suspected", False)),
+            compliance_risk=str(parsed.get("compliance_risk", "low")),
+            trust_justification=str(parsed.get("trust_justification", "No concerns identified")),
+        )
+
+    @staticmethod
+    def _parse_question_scores(results: List[Dict[str, Any]]) -> List[QuestionScore]:
+        if not isinstance(results, list) or not results:
+            raise ValueError("question_scores missing from response")
+        output = []
+        for r in results:
+            if not isinstance(r, dict):
+                continue
+            max_score = max(1, int(_number(r.get("max_score"), 5)))
+            score = max(0, min(int(_number(r.get("score"), 0)), max_score))
+            # Every field is coerced to its declared type and range here, so skip re-validating 20 models
+            output.append(
+                QuestionScore.model_construct(
+                    category=str(r.get("category", "Unknown")),
+                    question=str(r.get("question", "")),
+                    answer=str(r.get("answer", "NA")),
+                    score=score,
+                    max_score=max_score,
+                )
+            )
+        if not output:
+            raise ValueError("question_scores has no usable rows")
+        return output
 
 
 # Singleton instance for use throughout the app
@@ -3,6 +3,7 @@ Supabase Storage Service for handling audio file uploads, downloads, and deletio
 Files are automatically set to expire after 3 days.
 """
 import os
+import asyncio
 import tempfile
 from datetime import datetime, timedelta
 from typing import Optional, Tuple
@@ -37,6 +38,10 @@ class StorageService:
     
     async def ensure_bucket_exists(self) -> None:
         """Create the storage bucket if it doesn't exist"""
+        await asyncio.to_thread(self._ensure_bucket)
+    
+    def _ensure_bucket(self) -> None:
+        """Blocking half of ensure_bucket_exists (the Supabase client is synchronous)"""
         try:
             # Try to get bucket info
             self.client.storage.get_bucket(self.BUCKET_NAME)
@@ -55,12 +60,12 @@ class StorageService:
                 if "already exists" not in str(e).lower():
                     raise
     
-    async def upload_audio(self, file_content: bytes, filename: str, call_id: str) -> Tuple[str, datetime]:
+    async def upload_audio(self, file_path: str, filename: str, call_id: str) -> Tuple[str, datetime]:
         """
         Upload an audio file to Supabase Storage.
         
         Args:
-            file_content: The audio file content as bytes
+            file_path: Path to the audio file on local disk
             filename: Original filename
             call_id: Unique identifier for the call
             
@@ -73,11 +78,9 @@ class StorageService:
         file_extension = os.path.splitext(filename)[1] or ".mp3"
         storage_path = f"{call_id}{file_extension}"
         
-        # Upload to Supabase Storage
-        self.client.storage.from_(self.BUCKET_NAME).upload(
-            path=storage_path,
-            file=file_content,
-            file_options={"content-type": self._get_content_type(file_extension)}
+        # Upload to Supabase Storage in a worker thread so other awaits (transcription) keep running
+        await asyncio.to_thread(
+            self._upload_file, file_path, storage_path, self._get_content_type(file_extension)
         )
         
         # Calculate expiration date
@@ -85,6 +88,15 @@ class StorageService:
         
         return storage_path, expires_at
     
+    def _upload_file(self, file_path: str, storage_path: str, content_type: str) -> None:
+        """Stream a file from disk to the bucket (blocking)"""
+        with open(file_path, "rb") as audio_file:
+            self.client.storage.from_(self.BUCKET_NAME).upload(
+                path=storage_path,
+                file=audio_file,
+                file_options={"content-type": content_type}
+            )
+    
     async def get_audio_url(self, storage_path: str, expires_in: int = 3600) -> str:
         """
         Get a signed URL for accessing the audio file.
@@ -1,11 +1,22 @@
 import os
-from openai import OpenAI
+import asyncio
+from openai import AsyncOpenAI
 from typing import Dict, Any
 
 
 class TranscriptionService:
-    def __init__(self):
+    def __init__(self, max_concurrent_requests: int = 4):
         self._client = None
+        self._local_model = None
+        self._warmed_up = False
+        # Concurrent uploads share the Whisper rate limit; queue beyond this many in-flight requests
+        self._semaphore = asyncio.Semaphore(max_concurrent_requests)
+        
+        # "api" uses the hosted whisper-1 model, "local" runs faster-whisper (CTranslate2) in-process
+        self.backend = os.getenv("WHISPER_BACKEND", "api").lower()
+        self.model_size = os.getenv("WHISPER_MODEL_SIZE", "large-v2")
+        self.device = os.getenv("WHISPER_DEVICE", "cpu")
+        self.compute_type = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
     
     @property
     def client(self):
@@ -13,12 +24,52 @@ class TranscriptionService:
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 raise ValueError("OPENAI_API_KEY environment variable is not set. Please set it in your .env file.")
-            self._client = OpenAI(api_key=api_key)
+            self._client = AsyncOpenAI(api_key=api_key)
         return self._client
     
+    @property
+    def local_model(self):
+        """Lazy initialization of the faster-whisper model (WHISPER_BACKEND=local)"""
+        if self._local_model is None:
+            from faster_whisper import WhisperModel
+            
+            self._local_model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+        return self._local_model
+    
+    def warmup(self) -> None:
+        """
+        Load the local model and decode one second of silence, so kernel selection and
+        allocator warm-up happen at startup rather than on the first upload.
+        No-op for the hosted API, and safe to call more than once.
+        """
+        if self.backend != "local" or self._warmed_up:
+            return
+        import numpy as np
+        
+        segments, _ = self.local_model.transcribe(np.zeros(16000, dtype=np.float32))
+        list(segments)
+        self._warmed_up = True
+    
+    def _transcribe_local(self, audio_file_path: str, word_timestamps: bool = False) -> Dict[str, Any]:
+        """Run faster-whisper on a file (blocking - run it in a thread)"""
+        segments, info = self.local_model.transcribe(audio_file_path, word_timestamps=word_timestamps)
+        # segments is a generator - decoding happens while it is consumed
+        segments = list(segments)
+        
+        return {
+            "text": "".join(s.text for s in segments).strip(),
+            "duration": info.duration,
+            "language": info.language,
+            "words": [
+                {"word": w.word, "start": w.start, "end": w.end}
+                for s in segments for w in (s.words or [])
+            ],
+            "segments": [{"id": s.id, "start": s.start, "end": s.end, "text": s.text} for s in segments]
+        }
+    
     async def transcribe_audio(self, audio_file_path: str) -> Dict[str, Any]:
         """
-        Transcribe audio file using OpenAI Whisper API
+        Transcribe audio file using OpenAI Whisper API (or faster-whisper when WHISPER_BACKEND=local)
         
         Args:
             audio_file_path: Path to the audio file
@@ -27,13 +78,20 @@ class TranscriptionService:
             Dictionary containing transcription text, duration, and detected language
         """
         try:
-            with open(audio_file_path, "rb") as audio_file:
-                # Use Whisper API for transcription
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json"
-                )
+            if self.backend == "local":
+                async with self._semaphore:
+                    result = await asyncio.to_thread(self._transcribe_local, audio_file_path)
+                result.pop("words")
+                return result
+            
+            async with self._semaphore:
+                with open(audio_file_path, "rb") as audio_file:
+                    # Use Whisper API for transcription
+                    transcript = await self.client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=audio_file,
+                        response_format="verbose_json"
+                    )
             
             return {
                 "text": transcript.text,
@@ -49,13 +107,18 @@ class TranscriptionService:
         Transcribe audio with word-level timestamps
         """
         try:
-            with open(audio_file_path, "rb") as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json",
-                    timestamp_granularities=["word", "segment"]
-                )
+            if self.backend == "local":
+                async with self._semaphore:
+                    return await asyncio.to_thread(self._transcribe_local, audio_file_path, True)
+            
+            async with self._semaphore:
+                with open(audio_file_path, "rb") as audio_file:
+                    transcript = await self.client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=audio_file,
+                        response_format="verbose_json",
+                        timestamp_granularities=["word", "segment"]
+                    )
             
             return {
                 "text": transcript.text,